@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import jwt
+from fastapi import Request
+
+import database_async as adb
+from database import url
+from utils import TTLCache
+
+# --- CONFIG ---
+# HS256 projects sign with the JWT secret; asymmetric projects publish their keys as JWKS.
+JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+JWKS_URL = f"{url.rstrip('/')}/auth/v1/.well-known/jwks.json" if url else None
+JWT_AUDIENCE = "authenticated"
+JWKS_TTL = 3600
+CLAIMS_TTL = 300       # Upper bound; entries never outlive the token's own exp
+PROFILE_TTL = 60       # Bounds staleness for changes made outside this server (e.g. onboarding)
+CACHE_SIZE = 10000
+
+_claims = TTLCache(CACHE_SIZE, CLAIMS_TTL)      # {sha256(token): claims}
+_profiles = TTLCache(CACHE_SIZE, PROFILE_TTL)   # {user_id: users row}
+_jwks = TTLCache(1, JWKS_TTL)                   # {"keys": {kid: key}}
+_jwks_lock = asyncio.Lock()
+
+
+async def _load_jwks():
+    keys = _jwks.get("keys")
+    if keys is not None or not JWKS_URL or not adb.http_client:
+        return keys or {}
+    async with _jwks_lock:
+        keys = _jwks.get("keys")
+        if keys is None:
+            try:
+                res = await adb.http_client.get(JWKS_URL)
+                res.raise_for_status()
+                keys = {k.get("kid"): jwt.PyJWK(k).key for k in res.json().get("keys", [])}
+            except Exception as e:
+                print(f"AUTH WARNING: could not load JWKS: {e}")
+                keys = {}
+            _jwks.set("keys", keys)
+    return keys
+
+
+async def _verify_locally(token):
+    """Checks signature, expiry and audience without leaving the process. None if we can't."""
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        key = JWT_SECRET
+    else:
+        key = (await _load_jwks()).get(header.get("kid"))
+    if not key:
+        return None
+    return jwt.decode(token, key, algorithms=[algorithm], audience=JWT_AUDIENCE)
+
+
+async def verify_token(token):
+    """
+    Returns the token's claims, or None if it is invalid.
+    Verified tokens are cached until they expire, so repeat requests cost nothing.
+    Projects without a usable local key fall back to one Supabase Auth round trip.
+    """
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    claims = _claims.get(cache_key)
+    if claims is not None:
+        return claims
+
+    try:
+        claims = await _verify_locally(token)
+        if claims is None:
+            user_response = await adb.supabase.auth.get_user(token)
+            if not user_response or not user_response.user:
+                return None
+            claims = {"sub": user_response.user.id}
+    except jwt.PyJWTError:
+        return None
+
+    expires_in = claims.get("exp", time.time() + CLAIMS_TTL) - time.time()
+    if expires_in > 0:
+        _claims.set(cache_key, claims, ttl=min(CLAIMS_TTL, expires_in))
+    return claims
+
+
+async def get_profile(user_id):
+    profile = _profiles.get(user_id)
+    if profile is not None:
+        return profile
+    res = await adb.execute(adb.supabase.table("users").select("*").eq("id", user_id))
+    if not res.data:
+        return None
+    _profiles.set(user_id, res.data[0])
+    return res.data[0]
+
+
+def invalidate_user(user_id):
+    """Drops a cached profile. Call this whenever credits, kills or username change."""
+    _profiles.pop(user_id)
+
+
+async def get_current_user(request: Request):
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith("Bearer ") or not adb.supabase:
+        return None
+    try:
+        token = auth_header.split(" ")[1]
+        claims = await verify_token(token)
+        if not claims or not claims.get("sub"):
+            return None
+        # Fetch public profile to get username
+        return await get_profile(claims["sub"])
+    except Exception as e:
+        print(f"AUTH ERROR: {str(e)}")
+        return None
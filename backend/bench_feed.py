@@ -0,0 +1,125 @@
+"""
+Feed Query Benchmark:
+Runs the feed page builder against a stubbed Supabase client and counts round trips.
+The query count must stay flat as the number of posts grows, and the
+time per page must stay flat as the catalogue grows.
+
+Usage: python bench_feed.py
+"""
+import asyncio
+import time
+from datetime import datetime
+
+from starlette.requests import Request
+
+import database_async as adb
+import main
+
+COMMENTS_PER_POST = 10
+
+
+class StubQuery:
+    """Chainable query that records one round trip per execute()."""
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = {}
+        self.max_rows = None
+
+    def select(self, *args, **kwargs): return self
+    def eq(self, column, value): return self
+    def order(self, *args, **kwargs): return self
+    def or_(self, *args, **kwargs): return self
+    def maybe_single(self): return self
+    def single(self): return self
+    def upsert(self, *args, **kwargs): return self
+    def update(self, *args, **kwargs): return self
+    def insert(self, *args, **kwargs): return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def in_(self, column, values):
+        self.filters[column] = list(values)
+        return self
+
+    async def execute(self):
+        self.client.queries += 1
+        rows = self.client.tables.get(self.table, [])
+        for column, values in self.filters.items():
+            wanted = set(values)
+            rows = [row for row in rows if row.get(column) in wanted]
+        if self.max_rows is not None:
+            rows = rows[:self.max_rows]
+        return type("Response", (), {"data": rows})()
+
+
+class StubClient:
+    def __init__(self, posts):
+        now = datetime.utcnow().isoformat()
+        users = [{"id": f"u{i}", "username": f"user{i}", "avatar_url": None, "credits": 0} for i in range(posts)]
+        self.tables = {
+            "users": users,
+            "images": [{
+                "id": f"p{i}", "uploader_id": f"u{i}", "username": f"user{i}",
+                "storage_path": f"active/{i}.jpg", "bit_integrity": 100.0,
+                "generations": 0, "witnesses": 0, "is_destroyed": False,
+                "is_archived": False, "has_secret": i % 3 == 0, "last_viewed": now, "created_at": now, "caption": ""
+            } for i in range(posts)],
+            "comments": [{
+                "id": f"c{i}_{j}", "post_id": f"p{i}", "user_id": f"u{j % posts}",
+                "username": f"user{j % posts}", "content": "...", "created_at": now
+            } for i in range(posts) for j in range(COMMENTS_PER_POST)],
+        }
+        self.queries = 0
+
+    def table(self, name):
+        return StubQuery(self, name)
+
+    def rpc(self, name, params):
+        if name == "latest_comments":
+            return StubLatestComments(self, params)
+        return StubQuery(self, name)
+
+
+class StubLatestComments(StubQuery):
+    """latest_comments(post_ids, per_post): the newest rows of each post plus its total."""
+    def __init__(self, client, params):
+        super().__init__(client, "comments")
+        self.params = params
+
+    async def execute(self):
+        self.client.queries += 1
+        wanted = set(self.params["post_ids"])
+        by_post = {}
+        for row in self.client.tables["comments"]:
+            if row["post_id"] in wanted:
+                by_post.setdefault(row["post_id"], []).append(row)
+        rows = [{**row, "total": len(group)} for group in by_post.values() for row in group[-self.params["per_post"]:]]
+        return type("Response", (), {"data": rows})()
+
+
+def run(posts):
+    adb.supabase = StubClient(posts)
+    request = Request({"type": "http", "method": "GET", "path": "/feed", "headers": []})
+
+    start = time.perf_counter()
+    feed = asyncio.run(main.build_feed_page(request, cursor=None, limit=main.FEED_MAX_LIMIT))
+    elapsed = (time.perf_counter() - start) * 1000
+
+    assert len(feed.posts) == min(posts, main.FEED_MAX_LIMIT)
+    return adb.supabase.queries, elapsed
+
+
+if __name__ == "__main__":
+    print(f"{'posts':>8} {'queries':>8} {'ms':>10}")
+    counts = set()
+    for posts in (10, 50, 200, 1000, 10000):
+        queries, elapsed = run(posts)
+        counts.add(queries)
+        print(f"{posts:>8} {queries:>8} {elapsed:>10.1f}")
+
+    if len(counts) != 1:
+        raise SystemExit("FAIL: query count grows with the number of posts")
+    print("OK: query count is constant")
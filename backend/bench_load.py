@@ -0,0 +1,180 @@
+"""
+Load Benchmark:
+Drives /feed, /interact, /upload and the Reaper against the in-memory
+Supabase stand-in (fake_supabase.py), so performance can be measured
+without a live project. Every round trip costs --latency-ms, which makes
+query counts show up as wall-clock time the way they do in production.
+
+Reports p50/p99 latency, throughput and round trips per operation, then
+times one decay tick (including witness payouts) and one Reaper sweep.
+
+Usage: python bench_load.py [--posts 1000] [--concurrency 20] [--requests 200] [--latency-ms 5]
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import httpx
+import jwt
+from PIL import Image
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+import auth
+import cleanup
+import database as db
+import database_async as adb
+import decay_engine
+import main
+from fake_supabase import FakeDatabase
+
+JWT_SECRET = "bench-secret-for-local-load-tests-only"
+COMMENTS_PER_POST = 3
+USERS = 50
+
+
+def seed(fake, posts):
+    """Fills the fake with users, posts (one millisecond apart) and their comments."""
+    start = datetime.utcnow() - timedelta(hours=1)
+    users = fake.rows("users")
+    for i in range(USERS):
+        users.append({"id": f"00000000-0000-0000-0000-{i:012d}", "username": f"user{i}",
+                      "avatar_url": None, "credits": 10 ** 9, "kills": 0})
+
+    images, comments = fake.rows("images"), fake.rows("comments")
+    for i in range(posts):
+        author = users[i % USERS]
+        post_id = f"10000000-0000-0000-0000-{i:012d}"
+        stamp = (start + timedelta(milliseconds=i)).isoformat()
+        images.append({
+            "id": post_id, "uploader_id": author["id"], "username": author["username"],
+            "storage_path": f"working/{i}.jpg", "original_storage_path": f"originals/{i}.png",
+            "caption": "", "bit_integrity": 100.0, "current_quality": 100.0, "generations": 0,
+            "witnesses": 0, "last_viewed": stamp, "created_at": stamp,
+            "is_destroyed": False, "is_archived": False, "has_secret": False,
+        })
+        for j in range(COMMENTS_PER_POST):
+            comments.append({"id": f"{i}-{j}", "post_id": post_id, "user_id": users[j]["id"],
+                             "username": users[j]["username"], "content": "...", "created_at": stamp,
+                             "parent_id": f"{i}-{j - 1}" if j else None})
+
+
+def token_for(user):
+    return jwt.encode({"sub": user["id"], "aud": auth.JWT_AUDIENCE,
+                       "exp": int(time.time()) + 3600}, JWT_SECRET, algorithm="HS256")
+
+
+def sample_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (90, 20, 160)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def drive(label, fake, concurrency, total, operation):
+    """Runs `operation(i)` `total` times with `concurrency` in flight and prints one result line."""
+    latencies = []
+    failures = 0
+    calls_before = fake.calls
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            ok = await operation(i)
+            latencies.append(time.perf_counter() - start)
+            failures += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    per_op = (fake.calls - calls_before) / total
+    print(f"{label:<10} {total:>6} {p50:>9.1f} {p99:>9.1f} {total / elapsed:>9.1f} {per_op:>9.1f} {failures:>6}")
+
+
+async def run(args):
+    fake = FakeDatabase(latency=args.latency_ms / 1000)
+    seed(fake, args.posts)
+    adb.supabase = fake.client()
+    db.supabase = fake.client(asynchronous=False)
+    auth.JWT_SECRET = JWT_SECRET
+    main.broadcast.bind(asyncio.get_running_loop())
+
+    users = fake.rows("users")
+    tokens = [token_for(user) for user in users]
+    post_ids = [row["id"] for row in fake.rows("images")]
+    image = sample_image()
+
+    print(f"catalogue: {args.posts} posts, concurrency {args.concurrency}, "
+          f"{args.latency_ms} ms per round trip\n")
+    print(f"{'scenario':<10} {'ops':>6} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'trips/op':>9} {'fail':>6}")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        def headers(i):
+            return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+        async def feed(i):
+            res = await client.get("/feed", headers=headers(i))
+            return res.status_code == 200
+
+        async def interact(i):
+            res = await client.post("/interact", headers=headers(i),
+                                    json={"post_id": post_ids[i % len(post_ids)], "action": "heal"})
+            return res.status_code == 200
+
+        async def upload(i):
+            res = await client.post("/upload", headers=headers(i),
+                                    files={"file": (f"{i}.png", image, "image/png")}, data={"caption": "bench"})
+            return res.status_code == 200
+
+        await drive("feed", fake, args.concurrency, args.requests, feed)
+        await drive("interact", fake, args.concurrency, args.requests, interact)
+        await drive("upload", fake, args.concurrency, max(1, args.requests // 10), upload)
+
+    # Decay tick: age the catalogue a few days so it rots, then time one tick.
+    # Viewers noted by the feed scenario above are paid for what they witnessed.
+    aged = (datetime.utcnow() - timedelta(days=args.tick_age_days)).isoformat()
+    for row in fake.rows("images"):
+        row["last_viewed"] = aged
+    credits_before = {user["id"]: user["credits"] for user in users}
+    calls_before = fake.calls
+    start = time.perf_counter()
+    await asyncio.to_thread(decay_engine.run_decay_tick)
+    elapsed = time.perf_counter() - start
+    paid = sum(1 for user in users if user["credits"] > credits_before[user["id"]])
+    print(f"\ndecay tick: {len(fake.rows('images'))} images in {elapsed * 1000:.0f} ms, "
+          f"{fake.calls - calls_before} round trips, {paid}/{len(users)} viewers paid")
+    if not paid:
+        raise SystemExit("FAIL: the decay tick paid no witness rewards")
+
+    # Reaper: kill a slice of the catalogue, then time one full sweep
+    doomed = fake.rows("images")[:args.reap]
+    for row in doomed:
+        row["is_destroyed"] = True
+    calls_before = fake.calls
+    start = time.perf_counter()
+    await cleanup.archive_dead_images()
+    elapsed = time.perf_counter() - start
+    archived = sum(1 for row in doomed if fake.find("images", row["id"])["is_archived"])
+    print(f"reaper: archived {archived}/{len(doomed)} in {elapsed * 1000:.0f} ms, "
+          f"{fake.calls - calls_before} round trips")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000, help="catalogue size")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated latency per round trip")
+    parser.add_argument("--tick-age-days", type=float, default=3.0, help="time since the last tick before the decay tick")
+    parser.add_argument("--reap", type=int, default=500, help="images killed before the Reaper sweep")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Frame Render Benchmark:
+Renders every integrity bucket of a large source (big enough for "auto" to pick
+tiles by default), from pristine down to dead, with bitrot's whole-image pass and with the
+incremental tile renderer, in this process.
+Then steps several sources through every bucket the way the render workers do
+(decay_queue.py): once through one shared process pool, where a source's jobs
+land on whichever process is free, and once through per-source routed workers,
+where its tile state stays warm.
+Also checks that an incremental render is byte-identical to a fresh one.
+
+Usage: python bench_render.py [width] [height] [sources] [workers]
+"""
+import io
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bitrot
+import numpy as np
+from PIL import Image
+
+import decay
+import decay_queue
+import tile_decay
+
+
+def make_source(width, height):
+    rng = np.random.default_rng(7)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.integers(0, 40, size=(height, width, 3))
+    pixels = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def timed(render):
+    start = time.perf_counter()
+    render()
+    return (time.perf_counter() - start) * 1000
+
+
+def step_through_buckets(sources, pool_of, buckets):
+    """Renders every source at each bucket in turn, all sources in parallel, like successive ticks."""
+    with ThreadPoolExecutor(len(sources)) as threads:
+        for bucket in buckets:
+            list(threads.map(
+                lambda item: decay_queue._render_in_pool(pool_of(item[0]), item[1], bucket),
+                sources.items()
+            ))
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else decay_queue.WORKER_PROCESSES
+    source_count = int(sys.argv[3]) if len(sys.argv) > 3 else 2 * workers
+    source = make_source(width, height)
+    buckets = range(decay.integrity_bucket(100.0) - 1, -1, -1)
+
+    print(f"source: {width}x{height} PNG, {len(source) / 1e6:.1f} MB\n")
+    print(f"{'bucket':>6} {'full ms':>10} {'tiles ms':>10}")
+    full_total = tiles_total = 0.0
+    for bucket in buckets:
+        integrity = decay.bucket_integrity(bucket)
+        full = timed(lambda: bitrot.decay_bytes(source, integrity=max(0.01, integrity / 100.0)))
+        tiles = timed(lambda: tile_decay.render(source, integrity))
+        full_total += full
+        tiles_total += tiles
+        print(f"{bucket:>6} {full:>10.0f} {tiles:>10.0f}")
+    print(f"{'total':>6} {full_total:>10.0f} {tiles_total:>10.0f}")
+
+    # Render workers: {path: source bytes}, each source slightly different so it has its own tile state
+    sources = {f"originals/{i}.png": make_source(width + i, height) for i in range(source_count)}
+    print(f"\n{source_count} sources through {workers} render workers (mode: {tile_decay.DECAY_MODE}, "
+          f"tiles from {tile_decay.AUTO_MIN_PIXELS / 1e6:.1f} MP)")
+    shared = ProcessPoolExecutor(max_workers=workers)
+    routed = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+    try:
+        shared_ms = timed(lambda: step_through_buckets(sources, lambda path: shared, buckets))
+        routed_ms = timed(lambda: step_through_buckets(sources, lambda path: decay_queue.pool_for(path, routed), buckets))
+    finally:
+        shared.shutdown()
+        for pool in routed:
+            pool.shutdown()
+    renders = source_count * len(buckets)
+    print(f"shared pool:    {shared_ms:>8.0f} ms ({shared_ms / renders:.0f} ms/render)")
+    print(f"routed workers: {routed_ms:>8.0f} ms ({routed_ms / renders:.0f} ms/render)")
+
+    # Incremental state must not change the output
+    tile_decay.render(source, 40.0)
+    incremental = tile_decay.render(source, 35.0)
+    tile_decay._states.clear()
+    fresh = tile_decay.render(source, 35.0)
+    if incremental != fresh:
+        raise SystemExit("FAIL: incremental render differs from a fresh render")
+    print("\nOK: incremental renders are identical to fresh renders")
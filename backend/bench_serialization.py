@@ -0,0 +1,80 @@
+"""
+Feed Serialization Benchmark:
+Encodes a 500-post feed page the old way (plain dicts through FastAPI's
+default JSONResponse) and the new way (slotted records through
+CompactJSONResponse), and compares time and bytes on the wire.
+
+Usage: python bench_serialization.py
+"""
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from responses import CompactJSONResponse, brotli
+from schemas import FeedComment, FeedPage, FeedPost
+
+POSTS = 500
+COMMENTS_PER_POST = 5
+ROUNDS = 20
+IMAGE_URL = "https://example.supabase.co/storage/v1/object/public/bitloss-images/frames/1700000000_123/17.jpg"
+
+
+def legacy_page():
+    now = datetime.utcnow().isoformat()
+    return {"posts": [{
+        "id": f"p{i}", "username": f"user{i}", "avatar_url": None, "image": IMAGE_URL,
+        "bitIntegrity": 87.123456789, "generations": i, "witnesses": i,
+        "caption": "signal lost in the noise", "has_secret": i % 3 == 0,
+        "comments": [{
+            "id": f"c{i}_{j}", "username": f"user{j}", "avatar_url": None,
+            "content": "it is fading", "created_at": now, "parent_id": None
+        } for j in range(COMMENTS_PER_POST)],
+        "comment_count": COMMENTS_PER_POST
+    } for i in range(POSTS)], "next_cursor": None}
+
+
+def record_page():
+    now = datetime.utcnow().isoformat()
+    return FeedPage(posts=[FeedPost(
+        id=f"p{i}", username=f"user{i}", avatar_url=None, image=IMAGE_URL,
+        bitIntegrity=87.123456789, generations=i, witnesses=i,
+        caption="signal lost in the noise", has_secret=i % 3 == 0,
+        comments=[FeedComment(
+            id=f"c{i}_{j}", username=f"user{j}", avatar_url=None,
+            content="it is fading", created_at=now
+        ) for j in range(COMMENTS_PER_POST)],
+        comment_count=COMMENTS_PER_POST
+    ) for i in range(POSTS)])
+
+
+def request(accept_encoding):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "GET", "path": "/feed", "headers": headers})
+
+
+def measure(label, build):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        response = build()
+    elapsed = (time.perf_counter() - start) * 1000 / ROUNDS
+    print(f"{label:<34} {len(response.body):>10} {elapsed:>10.2f}")
+    return len(response.body), elapsed
+
+
+if __name__ == "__main__":
+    legacy, records = legacy_page(), record_page()
+
+    print(f"{'encoding (500 posts)':<34} {'bytes':>10} {'ms':>10}")
+    before = measure("before: dicts + JSONResponse", lambda: JSONResponse(jsonable_encoder(legacy)))
+    measure("after: records + orjson", lambda: CompactJSONResponse(records, request(None)))
+    gzipped = measure("after: records + orjson + gzip", lambda: CompactJSONResponse(records, request("gzip")))
+    if brotli is not None:
+        measure("after: records + orjson + br", lambda: CompactJSONResponse(records, request("br, gzip")))
+    else:
+        print("(brotli not installed, br skipped)")
+
+    print(f"\nwire bytes: {before[0] / gzipped[0]:.1f}x smaller with gzip, "
+          f"encode time: {before[1] / gzipped[1]:.1f}x faster")
@@ -0,0 +1,59 @@
+"""
+Secret Readability Check:
+Hides secrets of realistic lengths in a working-copy-sized carrier the way
+/upload does (stego.fits up front, then stego.embed_file: per-post seed,
+redundancy scaled to the length, checked at the reveal gate), then reads each
+one back at every bucket from pristine down to below the gate, through the
+same carrier rot /reveal uses.
+Every secret must read at every bucket at or above reveal.MIN_INTEGRITY;
+below it the gate answers before the pixels are ever read.
+
+Usage: python bench_stego.py [width] [height]
+"""
+import sys
+import time
+
+import decay
+import reveal
+import stego
+from bench_render import make_source
+
+SECRET_LENGTHS = (8, 25, 48, 72, 140)
+
+
+def secret_of(length):
+    text = "meet me where the signal dies, bring the second key "
+    return (text * (length // len(text) + 1))[:length]
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else decay.WORKING_MAX_SIDE
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else decay.WORKING_MAX_SIDE * 3 // 4
+    source = make_source(width, height)
+
+    gate = decay.integrity_bucket(reveal.MIN_INTEGRITY)
+    buckets = list(range(decay.integrity_bucket(100.0), gate - 3, -1))
+    print(f"carrier: {width}x{height}, gate {reveal.MIN_INTEGRITY:.0f}% (bucket {gate})\n")
+    print(f"{'chars':>5} {'rs bytes':>8} {'embed s':>8}  " + " ".join(f"{b:>4}" for b in buckets))
+
+    failures = []
+    for length in SECRET_LENGTHS:
+        message = secret_of(length)
+        if not stego.fits(source, message):
+            failures.append((length, "does not fit"))
+            continue
+        start = time.perf_counter()
+        carrier, seed, redundancy = stego.embed_file(source, message)
+        embed_seconds = time.perf_counter() - start
+
+        marks = []
+        for bucket in buckets:
+            ok = stego.extract_bytes(carrier, seed, redundancy, bucket) == (True, message)
+            marks.append("ok" if ok else "--")
+            if bucket >= gate and not ok:
+                failures.append((length, bucket))
+        print(f"{length:>5} {redundancy:>8} {embed_seconds:>8.1f}  " + " ".join(f"{m:>4}" for m in marks))
+
+    if failures:
+        raise SystemExit(f"FAIL: secrets unreadable above the gate at (chars, bucket): {failures}")
+    print(f"\nOK: every secret reads at every bucket down to {reveal.MIN_INTEGRITY:.0f}%")
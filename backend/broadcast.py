@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+
+from responses import dumps
+
+# --- CONFIG ---
+SUBSCRIBER_BACKLOG = 256   # Events buffered per client before it is considered too slow
+HEARTBEAT_SECONDS = 15     # Keeps proxies from closing idle streams
+
+# --- STATE ---
+# One queue per connected client. Publishing is O(clients) and never touches the database.
+_loop = None
+_subscribers = set()
+_sequence = itertools.count(1)
+_CLOSE = object()
+
+
+def bind(loop):
+    """Remembers the event loop so background threads (the decay engine) can publish."""
+    global _loop
+    _loop = loop
+
+
+def format_event(event, data, event_id=None):
+    """Serializes one Server-Sent Event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {dumps(data).decode()}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _fanout(message):
+    for queue in list(_subscribers):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow to keep up: end its stream; EventSource reconnects and gets a fresh snapshot
+            _subscribers.discard(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(_CLOSE)
+
+
+def publish(event, data):
+    """
+    Sends a delta to every connected client. Safe to call from the event loop
+    or from a worker thread.
+    """
+    if not _subscribers:
+        return
+    message = format_event(event, data, next(_sequence))
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is not None and running is _loop:
+        _fanout(message)
+    elif _loop is not None:
+        _loop.call_soon_threadsafe(_fanout, message)
+
+
+def subscribe():
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+    _subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(queue):
+    _subscribers.discard(queue)
+
+
+def client_count():
+    return len(_subscribers)
+
+
+async def stream(request, queue, snapshot):
+    """Yields the snapshot, then deltas as they are published, until the client leaves."""
+    try:
+        yield format_event("snapshot", snapshot)
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": heartbeat\n\n"
+                continue
+            if message is _CLOSE:
+                return
+            yield message
+    finally:
+        unsubscribe(queue)
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+
+from fastapi import Request, Response
+
+from responses import CompactJSONResponse, dumps
+from utils import TTLCache
+
+# --- CONFIG ---
+# Seconds each shared (same-for-everyone) route may be served from memory.
+# The Reaper invalidates the archive-backed ones as soon as something dies.
+ROUTE_TTLS = {
+    "graveyard": 30,
+    "archive": 60,
+}
+
+# --- STATE ---
+_responses = TTLCache(len(ROUTE_TTLS) * 4, max(ROUTE_TTLS.values()))  # {name: (body, etag)}
+_in_flight = {}   # {name: Future} so a burst of misses shares one query
+_generation = {}  # {name: int} bumped on invalidation; stale loads are not stored
+
+
+async def single_flight(in_flight, key, loader):
+    """
+    Awaits `loader()` once for every caller asking for `key` at the same time:
+    the rest share its result (or its exception). `in_flight` is the caller's
+    {key: Future} dict.
+    """
+    pending = in_flight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    in_flight[key] = future
+    try:
+        result = await loader()
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Marks it retrieved when nobody else was waiting
+        raise
+    finally:
+        in_flight.pop(key, None)
+
+
+async def load(name, loader):
+    """
+    Returns (body, etag) for a shared route, calling `loader` (an async function
+    returning records or JSON-able data) at most once per TTL no matter how many requests miss.
+    """
+    cached = _responses.get(name)
+    if cached is not None:
+        return cached
+
+    async def fill():
+        generation = _generation.get(name, 0)
+        body = dumps(await loader())
+        entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        # Anything invalidated while we were loading is refetched by the next caller
+        if _generation.get(name, 0) == generation:
+            _responses.set(name, entry, ttl=ROUTE_TTLS[name])
+        return entry
+    return await single_flight(_in_flight, name, fill)
+
+
+def respond(request: Request, name, body, etag):
+    """Builds the response, answering 304 when the client already has this version."""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={ROUTE_TTLS[name]}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return CompactJSONResponse(body, request, headers=headers)
+
+
+async def serve(request: Request, name, loader):
+    body, etag = await load(name, loader)
+    return respond(request, name, body, etag)
+
+
+def invalidate(*names):
+    """Drops cached responses (all of them when no names are given)."""
+    for name in names or ROUTE_TTLS:
+        _generation[name] = _generation.get(name, 0) + 1
+        _responses.pop(name)
+
+
+def stats():
+    return {"hits": _responses.hits, "misses": _responses.misses, "in_flight": len(_in_flight)}
@@ -1,77 +1,254 @@
 import asyncio
-import database as db
+import time
+
+import database_async as adb
+import decay
+import fanout
+import metrics
+from schemas import REAPER_COLUMNS
 
 # --- CONFIG ---
 BUCKET_NAME = "bitloss-images"
+REAPER_BATCH_SIZE = 200          # Dead images handled per round of bulk calls
+STORAGE_REMOVE_MAX_PATHS = 1000  # Storage API limit on paths per remove call
+SAFETY_SWEEP_SECONDS = 900       # Full scan, only for deaths nobody reported
+REAP_DEBOUNCE_SECONDS = 0.5      # Lets a burst of deaths be archived as one batch
+
+# --- STATE ---
+# Ids reported dead but not yet archived. Only touched on the event loop.
+_loop = None
+_wakeup = None
+_reported = set()
+
+
+def _rot_paths(original_path):
+    """Everything decay produced for an image: frames, the working copy and the legacy active upload."""
+    paths = decay.all_frame_paths(original_path)
+    paths.append(decay.working_path(original_path))
+    paths.append(original_path.replace("originals/", "active/"))
+    return paths
+
+
+def report_deaths(post_ids):
+    """
+    Hands newly destroyed images to the Reaper so they are archived right away.
+    Safe to call from the event loop or from a worker thread (the decay engine).
+    """
+    post_ids = [pid for pid in post_ids if pid is not None]
+    if not post_ids or _loop is None:
+        return  # Reaper not running; the safety sweep will find them
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _loop:
+        _enqueue(post_ids)
+    else:
+        _loop.call_soon_threadsafe(_enqueue, post_ids)
+
+
+def _enqueue(post_ids):
+    _reported.update(post_ids)
+    _wakeup.set()
+
+
+async def _fetch_dead_by_ids(post_ids):
+    """The reported images that really are dead and still unarchived."""
+    response = await adb.execute(
+        adb.supabase.table("images")
+        .select(REAPER_COLUMNS)
+        .in_("id", post_ids)
+        .eq("is_destroyed", True)
+        .eq("is_archived", False)
+    )
+    return response.data or []
+
+
+async def _fetch_dead_batch(after_id):
+    """Next page of dead images that are not yet archived, in id order."""
+    query = (
+        adb.supabase.table("images")
+        .select(REAPER_COLUMNS)
+        .eq("is_destroyed", True)
+        .eq("is_archived", False)
+    )
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    response = await adb.execute(query.order("id").limit(REAPER_BATCH_SIZE))
+    return response.data or []
+
+
+async def _remove_from_storage(paths, bucket=BUCKET_NAME):
+    storage = adb.supabase.storage.from_(bucket)
+    await asyncio.gather(*[
+        storage.remove(paths[i:i + STORAGE_REMOVE_MAX_PATHS])
+        for i in range(0, len(paths), STORAGE_REMOVE_MAX_PATHS)
+    ])
+
+
+async def _delete_for_posts(table, column, post_ids, label):
+    try:
+        await adb.execute(adb.supabase.table(table).delete().in_(column, post_ids))
+    except Exception as e:
+        print(f"REAPER: failed to delete {label}: {e}")
+
+
+async def _reap_batch(dead_images):
+    """Archives one page of dead images with a constant number of round trips. Returns timings."""
+    timings = {}
+    post_ids = [img['id'] for img in dead_images]
+
+    # --- STEP A+B: SILENCE COMMENTS, DELETE SECRETS (one call each for the whole batch) ---
+    start = time.perf_counter()
+    await asyncio.gather(
+        _delete_for_posts("comments", "post_id", post_ids, "comments"),
+        _delete_for_posts("image_secrets", "image_id", post_ids, "secrets"),
+    )
+    timings["cleanup"] = time.perf_counter() - start
+
+    # --- STEP C: DELETE THE ROT (one multi-path storage call) ---
+    archived_paths = []
+    rot_paths = []
+    for img in dead_images:
+        current_path = img.get('storage_path')
+        if current_path and ("active/" in current_path or current_path.startswith(("frames/", "working/"))):
+            # Restore the memory: point back at the untouched original
+            original_path = img.get('original_storage_path') or current_path.replace("active/", "originals/")
+            rot_paths.extend(_rot_paths(original_path))
+            archived_paths.append(original_path)
+        else:
+            # Fallback for weird paths: archive in place
+            archived_paths.append(current_path)
+
+    # Secret carriers live in the private bucket; the archive keeps the secret-free original
+    carrier_paths = [decay.carrier_path(img['original_storage_path'])
+                     for img in dead_images if img.get('has_secret') and img.get('original_storage_path')]
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        _remove_from_storage(rot_paths),
+        _remove_from_storage(carrier_paths, decay.SECRETS_BUCKET_NAME),
+    )
+    timings["storage"] = time.perf_counter() - start
+
+    # --- STEP D: ARCHIVE (one bulk update; an image deleted meanwhile is skipped, not re-created) ---
+    start = time.perf_counter()
+    await adb.execute(adb.supabase.rpc("archive_images", {"image_ids": post_ids, "paths": archived_paths}))
+    timings["update"] = time.perf_counter() - start
+
+    for step, seconds in timings.items():
+        metrics.reaper_batch_latency.observe(seconds, step=step)
+
+    fanout.remove_trending([img['id'] for img in dead_images])
+    for img in dead_images:
+        fanout.publish("archive", {"id": img['id']})
+    return timings
+
 
 async def archive_dead_images():
     """
     The Reaper:
-    1. Checks for destroyed images (is_destroyed=True) not yet archived.
+    1. Pages through destroyed images (is_destroyed=True) not yet archived.
     2. Deletes associated comments and secrets (Cleanup).
-    3. Deletes the corrupted 'active' file (Storage Optimization).
+    3. Deletes the working copy, its decay frames and any secret carrier (Storage Optimization).
     4. Updates DB to point to the 'original' backup and marks as archived (Restoration).
+    5. Drops the cached graveyard/archive/trending responses.
+    Every step is one bulk call per batch, so a sweep costs O(batches) round trips, not O(images).
     """
     # 1. SAFETY CHECK
-    if not db.supabase: 
+    if not adb.supabase:
         print("REAPER: Database offline. Skipping scan.")
         return
 
+    archived = 0
+    after_id = None
+    batch_number = 0
     try:
-        # 2. Find images that are dead but NOT yet archived
-        response = db.supabase.table("images")\
-            .select("*")\
-            .eq("is_destroyed", True)\
-            .eq("is_archived", False)\
-            .execute()
-        
-        dead_images = response.data
+        while True:
+            start = time.perf_counter()
+            dead_images = await _fetch_dead_batch(after_id)
+            scan_seconds = time.perf_counter() - start
+            metrics.reaper_batch_latency.observe(scan_seconds, step="scan")
+            if not dead_images:
+                break
 
-        if not dead_images: 
-            return
+            batch_number += 1
+            after_id = dead_images[-1]['id']
+            try:
+                timings = await _reap_batch(dead_images)
+                archived += len(dead_images)
+                print(
+                    f"REAPER: batch {batch_number} archived {len(dead_images)} artifacts in "
+                    f"{(time.perf_counter() - start) * 1000:.0f} ms "
+                    f"(scan {scan_seconds * 1000:.0f}, cleanup {timings['cleanup'] * 1000:.0f}, "
+                    f"storage {timings['storage'] * 1000:.0f}, update {timings['update'] * 1000:.0f})"
+                )
+            except Exception as e:
+                # Left unarchived; the next sweep retries the whole batch
+                print(f"REAPER: batch {batch_number} failed: {e}")
 
-        print(f"REAPER: Found {len(dead_images)} dead artifacts. Processing...")
+            if len(dead_images) < REAPER_BATCH_SIZE:
+                break
 
-        for img in dead_images:
-            post_id = img['id']
-            active_path = img.get('storage_path')
+    except Exception as e:
+        print(f"REAPER CRITICAL ERROR: {e}")
 
-            # --- STEP A: DELETE COMMENTS ---
-            try:
-                db.supabase.table("comments").delete().eq("post_id", post_id).execute()
-                print(f"[{post_id}] Comments silenced.")
-            except Exception:
-                pass
+    if archived:
+        # The graveyard, archive and trending responses all changed
+        fanout.invalidate_cache()
 
-            # --- STEP B: DELETE SECRETS ---
-            try:
-                db.supabase.table("image_secrets").delete().eq("image_id", post_id).execute()
-                print(f"[{post_id}] Secrets deleted.")
-            except Exception:
-                pass 
-
-            # --- STEP C: SWAP FILE & ARCHIVE ---
-            if active_path and "active/" in active_path:
-                try:
-                    # 1. Remove active file from storage (Delete the rot)
-                    db.supabase.storage.from_(BUCKET_NAME).remove([active_path])
-                    
-                    # 2. Calculate original path (Restore the memory)
-                    original_path = active_path.replace("active/", "originals/")
-                    
-                    # 3. Update DB
-                    db.supabase.table("images").update({
-                        "storage_path": original_path,
-                        "is_archived": True,
-                        "witnesses": 0
-                    }).eq("id", post_id).execute()
-                    
-                    print(f"[{post_id}] Archived and restored memory.")
-                except Exception as e:
-                    print(f"[{post_id}] Failed to archive: {e}")
-            else:
-                # Fallback for weird paths
-                db.supabase.table("images").update({"is_archived": True}).eq("id", post_id).execute()
 
-    except Exception as e:
-        print(f"REAPER CRITICAL ERROR: {e}")
\ No newline at end of file
+async def archive_reported():
+    """Archives exactly the images reported through report_deaths(), without scanning the table."""
+    if not _reported or not adb.supabase:
+        return
+    post_ids = list(_reported)
+    _reported.clear()
+
+    archived = 0
+    for i in range(0, len(post_ids), REAPER_BATCH_SIZE):
+        start = time.perf_counter()
+        try:
+            dead_images = await _fetch_dead_by_ids(post_ids[i:i + REAPER_BATCH_SIZE])
+            if not dead_images:
+                continue
+            timings = await _reap_batch(dead_images)
+            archived += len(dead_images)
+            print(
+                f"REAPER: archived {len(dead_images)} reported artifacts in "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms "
+                f"(cleanup {timings['cleanup'] * 1000:.0f}, storage {timings['storage'] * 1000:.0f}, "
+                f"update {timings['update'] * 1000:.0f})"
+            )
+        except Exception as e:
+            # Whatever is left dead is picked up by the safety sweep
+            print(f"REAPER: failed to archive reported artifacts: {e}")
+
+    if archived:
+        fanout.invalidate_cache()
+
+
+async def run_reaper():
+    """
+    Archives deaths as soon as they are reported (started from lifespan in every worker:
+    each worker archives what it reported itself, so nothing is done twice).
+    """
+    global _loop, _wakeup
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+
+    while True:
+        await _wakeup.wait()
+        await asyncio.sleep(REAP_DEBOUNCE_SECONDS)
+        _wakeup.clear()
+        await archive_reported()
+
+
+async def run_safety_sweep():
+    """
+    Full scan for deaths nobody reported (leader only, see leader.py).
+    Runs once on takeover to catch up on downtime, then every SAFETY_SWEEP_SECONDS.
+    """
+    while True:
+        await archive_dead_images()
+        await asyncio.sleep(SAFETY_SWEEP_SECONDS)
@@ -0,0 +1,81 @@
+import database_async as adb
+from schemas import COMMENT_COLUMNS, CommentNode, CommentPage, FeedComment
+
+# --- CONFIG ---
+FEED_COMMENTS_PER_POST = 3   # Preview shown under each feed post; the rest load on demand
+THREAD_PAGE_DEFAULT = 50
+THREAD_PAGE_MAX = 200
+
+
+def commenter_ids(comments_by_post):
+    """User ids to include in the feed's batched users lookup."""
+    return [c.get('user_id') for rows in comments_by_post.values() for c in rows]
+
+
+def _avatar(row, users):
+    user = users.get(row.get('user_id'))
+    return user.get('avatar_url') if user else None
+
+
+def feed_comments(rows, users):
+    """The feed preview of one post: flat, oldest first, with parent ids so the client can nest replies."""
+    return [
+        FeedComment(
+            id=str(c['id']),
+            username=c.get('username', 'Anonymous'),
+            avatar_url=_avatar(c, users),
+            content=c['content'],
+            created_at=c['created_at'],
+            parent_id=str(c['parent_id']) if c.get('parent_id') else None
+        )
+        for c in rows
+    ]
+
+
+def build_threads(rows, users):
+    """
+    Nests replies under their parents in one pass over `rows` (oldest first).
+    A reply is never older than its parent, so the parent is always seen first.
+    Replies whose parent is not in `rows` (it was on an earlier page) come back
+    as roots with parent_id set, for the client to attach.
+    """
+    nodes = {}
+    roots = []
+    for c in rows:
+        node = CommentNode(
+            id=str(c['id']),
+            username=c.get('username', 'Anonymous'),
+            avatar_url=_avatar(c, users),
+            content=c['content'],
+            created_at=c['created_at'],
+            parent_id=str(c['parent_id']) if c.get('parent_id') else None
+        )
+        nodes[node.id] = node
+        parent = nodes.get(node.parent_id)
+        if parent is not None:
+            parent.replies.append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+async def thread_page(post_id, after=None, limit=THREAD_PAGE_DEFAULT):
+    """
+    One page of a post's comments, oldest first, as threads. `after` is the
+    (created_at, id) of the last comment on the previous page.
+    Returns (CommentPage, last row) so the caller can encode the next cursor.
+    """
+    if not adb.supabase: return CommentPage(comments=[]), None
+
+    query = adb.supabase.table("comments").select(COMMENT_COLUMNS).eq("post_id", post_id)
+    if after:
+        created_at, last_id = after
+        query = query.or_(
+            f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt."{last_id}")'
+        )
+    response = await adb.execute(query.order("created_at").order("id").limit(limit + 1))
+    rows = response.data[:limit]
+    users = await adb.get_users_by_ids([c.get('user_id') for c in rows])
+
+    last = rows[-1] if len(response.data) > limit else None
+    return CommentPage(comments=build_threads(rows, users)), last
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import database_async as adb
+
+# --- CONFIG ---
+FLUSH_SECONDS = 5      # Longest a view waits before it is written
+FLUSH_EVENTS = 500     # ...or flush early once this many views are pending
+
+# --- STATE ---
+# Feed views (each bumps witnesses and generations by one) not yet in the database.
+# `_in_flight` holds the batch being written, so reads never dip while it commits.
+_lock = threading.Lock()
+_pending = {}      # {post_id: views}
+_in_flight = {}    # {post_id: views}
+_pending_events = 0
+_loop = None
+_wakeup = None
+
+
+def record_views(post_ids):
+    """Counts one view for each post. Costs nothing until the next flush."""
+    global _pending_events
+    with _lock:
+        for post_id in post_ids:
+            if post_id is not None:
+                _pending[post_id] = _pending.get(post_id, 0) + 1
+                _pending_events += 1
+        full = _pending_events >= FLUSH_EVENTS
+    if full and _loop is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def unflushed_views(post_id):
+    """Views of a post that the database does not have yet."""
+    with _lock:
+        return _pending.get(post_id, 0) + _in_flight.get(post_id, 0)
+
+
+def merged(row, column):
+    """A witnesses/generations value as readers should see it: persisted plus buffered."""
+    return (row.get(column) or 0) + unflushed_views(row['id'])
+
+
+def pending_count():
+    with _lock:
+        return _pending_events
+
+
+async def flush():
+    """Writes every buffered view in one statement. A failed batch is kept for the next flush."""
+    global _pending, _in_flight, _pending_events
+    with _lock:
+        if not _pending or _in_flight:
+            return
+        _in_flight, _pending, _pending_events = _pending, {}, 0
+        batch = _in_flight
+
+    try:
+        await adb.add_witnesses(batch)
+        batch = None
+    except Exception as e:
+        print(f"COUNTERS: flush of {len(batch)} posts failed, retrying next time: {e}")
+    finally:
+        # Failed or cancelled mid-write (shutdown): put the views back for the final flush
+        with _lock:
+            for post_id, views in (batch or {}).items():
+                _pending[post_id] = _pending.get(post_id, 0) + views
+                _pending_events += views
+            _in_flight = {}
+
+
+async def run_flusher():
+    """Flushes every FLUSH_SECONDS, or sooner when FLUSH_EVENTS views pile up (started from lifespan)."""
+    global _loop, _wakeup
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        await flush()
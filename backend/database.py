@@ -1,8 +1,12 @@
 import os
+import time
+import httpx
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from datetime import datetime
 
+import metrics
+
 # 1. Load env vars
 load_dotenv()
 url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
@@ -23,27 +27,45 @@ else:
     except Exception as e:
         print(f"Database Connection Error: {e}")
 
+# --- ROUND TRIPS ---
+# Every sync call (decay tick, ledger RPCs, frame storage I/O) goes through here,
+# so it is retried like database_async.execute and shows up in /metrics as client="sync".
+MAX_RETRIES = 3
+RETRY_DELAY = 0.2
+RETRYABLE_ERRORS = (httpx.RemoteProtocolError, httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ConnectError)
+
+def timed(call, *args, **kwargs):
+    """Runs one sync round trip (`call(*args, **kwargs)`), retrying connection errors."""
+    for attempt in range(MAX_RETRIES):
+        start = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        except RETRYABLE_ERRORS:
+            if attempt == MAX_RETRIES - 1:
+                print("❌ DB Connection failed after retries.")
+                raise
+            metrics.db_retries.inc(client="sync")
+            print(f"⚠️ DB Connection unstable. Retrying ({attempt+1}/{MAX_RETRIES})...")
+            time.sleep(RETRY_DELAY)
+        finally:
+            metrics.observe_query(time.perf_counter() - start, client="sync")
+
+def execute(query):
+    """Executes a sync query builder as one recorded round trip."""
+    return timed(query.execute)
+
 # --- CREDIT & SCORE FUNCTIONS ---
 
 def update_credits(user_id, amount):
     """
-    Modifies user credits using UUID (user_id).
+    Modifies user credits using UUID (user_id) in one atomic call.
+    Returns the new balance, or None if it would go negative (insufficient funds).
+    (Postgres function: sql/economy.sql)
     """
     if not supabase: return None
     try:
-        # 1. Get current credits using ID (safer than username)
-        res = supabase.table("users").select("credits").eq("id", user_id).execute()
-        if not res.data: return None
-        
-        current_credits = res.data[0].get('credits', 0)
-        new_balance = current_credits + amount
-        
-        if new_balance < 0:
-            return None # Insufficient funds
-            
-        # 2. Update
-        supabase.table("users").update({"credits": new_balance}).eq("id", user_id).execute()
-        return new_balance
+        res = execute(supabase.rpc("increment_credits", {"p_user_id": user_id, "p_amount": amount}))
+        return res.data
     except Exception as e:
         print(f"Error updating credits: {e}")
         return None
@@ -51,7 +73,7 @@ def update_credits(user_id, amount):
 def get_credits(user_id):
     if not supabase: return 0
     try:
-        res = supabase.table("users").select("credits").eq("id", user_id).execute()
+        res = execute(supabase.table("users").select("credits").eq("id", user_id))
         if res.data:
             return res.data[0].get('credits', 0)
         return 0
@@ -59,20 +81,31 @@ def get_credits(user_id):
         return 0
 
 def update_score(user_id, points, kill=False):
-    """Updates entropy_score and kills based on UUID."""
+    """Updates entropy_score and kills based on UUID, in one atomic call."""
     if not supabase: return
     try:
-        res = supabase.table("users").select("entropy_score, kills").eq("id", user_id).execute()
-        if not res.data: return
-        
-        current = res.data[0]
-        new_score = (current.get('entropy_score') or 0) + points
-        new_kills = (current.get('kills') or 0) + (1 if kill else 0)
-        
-        supabase.table("users").update({"entropy_score": new_score, "kills": new_kills}).eq("id", user_id).execute()
+        execute(supabase.rpc("increment_score", {
+            "p_user_id": user_id, "p_points": points, "p_kills": 1 if kill else 0
+        }))
     except Exception as e:
         print(f"Error updating score: {e}")
 
+def apply_rewards(rewards):
+    """
+    Pays out {user_id: (credits, kills)} earned by witnessing decay, for all users
+    in a single atomic call (used by the decay engine once per tick).
+    """
+    if not supabase or not rewards: return
+    user_ids = list(rewards)
+    try:
+        execute(supabase.rpc("apply_rewards", {
+            "p_user_ids": user_ids,
+            "p_credits": [rewards[uid][0] for uid in user_ids],
+            "p_kills": [rewards[uid][1] for uid in user_ids]
+        }))
+    except Exception as e:
+        print(f"Error applying rewards: {e}")
+
 # --- POST/IMAGE FUNCTIONS ---
 
 def create_post(user_id, username, image_path, caption="", secret_text=None):
@@ -98,7 +131,7 @@ def create_post(user_id, username, image_path, caption="", secret_text=None):
             "last_viewed": datetime.utcnow().isoformat()
         }
         
-        res = supabase.table("images").insert(data).execute()
+        res = execute(supabase.table("images").insert(data))
         if not res.data: return None
         
         new_image_id = res.data[0]['id']
@@ -109,7 +142,7 @@ def create_post(user_id, username, image_path, caption="", secret_text=None):
                 "image_id": new_image_id,
                 "secret_text": secret_text
             }
-            supabase.table("image_secrets").insert(secret_payload).execute()
+            execute(supabase.table("image_secrets").insert(secret_payload))
             
         return res.data[0]
         
@@ -117,33 +150,8 @@ def create_post(user_id, username, image_path, caption="", secret_text=None):
         print(f"Error creating post: {e}")
         return None
 
-def get_secret(post_id):
-    """
-    Retrieves secret text. (RLS policies on Supabase handle the security check)
-    """
-    if not supabase: return None
-    try:
-        # Changed to select "secret_text" specifically
-        res = supabase.table("image_secrets").select("secret_text").eq("image_id", post_id).execute()
-        if res.data and len(res.data) > 0:
-            return res.data[0]['secret_text']
-        return None 
-    except Exception as e:
-        print(f"Error fetching secret: {e}")
-        return None
-
 # --- COMMENT FUNCTIONS ---
 
-def get_comments(post_id):
-    if not supabase: return []
-    try:
-        # Fetch comments
-        response = supabase.table("comments").select("*").eq("post_id", post_id).order("created_at", desc=False).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        print(f"DATABASE ERROR (get_comments): {e}")
-        return []
-
 def add_comment(post_id, user_id, content, integrity, parent_id=None):
     """
     Add a new comment. Uses user_id (UUID) for foreign key linkage.
@@ -157,7 +165,7 @@ def add_comment(post_id, user_id, content, integrity, parent_id=None):
             "bit_integrity": integrity,
             "parent_id": parent_id
         }
-        response = supabase.table("comments").insert(data).execute()
+        response = execute(supabase.table("comments").insert(data))
         print(f"Comment saved! (Parent: {parent_id})")
         return response.data
     except Exception as e:
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+import metrics
+from database import key, service_key, url
+
+# --- CONFIG ---
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+REQUEST_TIMEOUT = 10.0
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.1
+RETRYABLE_ERRORS = (httpx.RemoteProtocolError, httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ConnectError)
+
+# One pooled HTTP client shared by postgrest, storage and auth for the whole process
+http_client: httpx.AsyncClient = None
+supabase: AsyncClient = None
+
+
+async def connect():
+    """Opens the shared connection pool and the async Supabase client (called from lifespan)."""
+    global http_client, supabase
+    if not url or not key:
+        print("WARNING: Supabase credentials missing, async data layer disabled")
+        return
+    try:
+        http_client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+            ),
+        )
+        supabase = await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+        print(f"Async Database Connected (Admin Mode: {bool(service_key)})")
+    except Exception as e:
+        print(f"Async Database Connection Error: {e}")
+
+
+async def close():
+    global http_client, supabase
+    if http_client:
+        await http_client.aclose()
+    http_client = None
+    supabase = None
+
+
+async def execute(query):
+    """
+    Runs a query, retrying transient connection errors with jittered exponential
+    backoff. Waiting never blocks the event loop.
+    """
+    for attempt in range(MAX_RETRIES):
+        start = time.perf_counter()
+        try:
+            return await query.execute()
+        except RETRYABLE_ERRORS:
+            if attempt == MAX_RETRIES - 1:
+                print("❌ DB Connection failed after retries.")
+                raise
+            metrics.db_retries.inc(client="async")
+            delay = RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ DB Connection unstable. Retrying ({attempt+1}/{MAX_RETRIES}) in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+        finally:
+            metrics.observe_query(time.perf_counter() - start, client="async")
+
+
+# --- BULK LOOKUPS (Feed Assembly) ---
+# Each helper below costs exactly one round trip, no matter how many ids it gets.
+
+async def get_users_by_ids(user_ids, columns="id, username, avatar_url"):
+    """Fetches many profiles at once. Returns {user_id: row}."""
+    ids = list({uid for uid in user_ids if uid})
+    if not supabase or not ids: return {}
+    try:
+        res = await execute(supabase.table("users").select(columns).in_("id", ids))
+        return {row['id']: row for row in (res.data or [])}
+    except Exception as e:
+        print(f"DATABASE ERROR (get_users_by_ids): {e}")
+        return {}
+
+
+async def get_latest_comments(post_ids, per_post):
+    """
+    Fetches the newest `per_post` comments of many posts at once (Postgres function: sql/comments.sql).
+    Returns ({post_id: [rows] oldest first}, {post_id: total comments}).
+    """
+    ids = list({pid for pid in post_ids if pid is not None})
+    if not supabase or not ids: return {}, {}
+    try:
+        res = await execute(supabase.rpc("latest_comments", {"post_ids": ids, "per_post": per_post}))
+        grouped, totals = {}, {}
+        for row in (res.data or []):
+            grouped.setdefault(row['post_id'], []).append(row)
+            totals[row['post_id']] = row['total']
+        for rows in grouped.values():
+            rows.sort(key=lambda row: (row['created_at'], str(row['id'])))
+        return grouped, totals
+    except Exception as e:
+        print(f"DATABASE ERROR (get_latest_comments): {e}")
+        return {}, {}
+
+
+async def add_witnesses(views):
+    """
+    Adds buffered feed views ({post_id: views}) to witnesses and generations
+    in a single atomic call (see counters.py; Postgres function: sql/decay_engine.sql).
+    """
+    if not supabase or not views: return
+    ids = list(views)
+    await execute(supabase.rpc("add_witnesses", {"image_ids": ids, "amounts": [views[i] for i in ids]}))
+
+
+# --- ECONOMY (sql/economy.sql) ---
+
+async def apply_interaction(user_id, post_id, action, cost):
+    """
+    Charges the user and heals/corrupts the post in one atomic call.
+    Returns {status, new_integrity, remaining_credits, destroyed}.
+    """
+    res = await execute(supabase.rpc("apply_interaction", {
+        "p_user_id": user_id, "p_image_id": post_id, "p_action": action, "p_cost": cost
+    }))
+    return res.data or {"status": "not_found"}
+
+
+# --- SECRETS (sql/secrets.sql) ---
+
+async def reveal_secret(post_id, min_integrity):
+    """
+    Integrity gate and secret lookup in one call (Postgres function: sql/secrets.sql).
+    Returns {status, ...}; status is not_found, too_low, no_secret or success, and a success
+    also carries secret_text, integrity, embedded and original_storage_path.
+    """
+    res = await execute(supabase.rpc("reveal_secret", {"p_image_id": post_id, "p_min_integrity": min_integrity}))
+    return res.data or {"status": "not_found"}
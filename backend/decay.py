@@ -1,38 +1,194 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
 import bitrot
+from PIL import Image
+
 import database as db
+import metrics
+import tile_decay
+from utils import RenderCache
+
+# --- CONFIG ---
+BUCKET_NAME = "bitloss-images"
+SECRETS_BUCKET_NAME = "bitloss-secrets"     # Private: secret carriers are never served
+INTEGRITY_BUCKET_SIZE = 5.0                 # Re-render only when integrity crosses a 5% step
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024   # Budget for cached rotted renders
+ORIGINAL_HASH_CACHE_SIZE = 4096             # storage path -> content hash of its original
+WORKING_MAX_SIDE = 1600                     # Longest edge of the working copy renders start from
+WORKING_JPEG_QUALITY = 90
+
+
+def integrity_bucket(health: float) -> int:
+    """Maps 0-100 integrity onto a bucket index (100% is its own bucket)."""
+    return int(max(0.0, min(100.0, health)) // INTEGRITY_BUCKET_SIZE)
+
+
+def bucket_integrity(bucket: int) -> float:
+    """The integrity a bucket is rendered at (its lower edge)."""
+    return bucket * INTEGRITY_BUCKET_SIZE
+
+
+# Rendered frames keyed by (original content hash, bucket): identical originals share entries
+render_cache = RenderCache(RENDER_CACHE_MAX_BYTES)
+_original_hashes = OrderedDict()
+_hash_lock = threading.Lock()
+_no_working_copy = set()   # Legacy originals with no working copy in storage
+
+
+def _remember_hash(original_path, digest):
+    with _hash_lock:
+        _original_hashes[original_path] = digest
+        _original_hashes.move_to_end(original_path)
+        while len(_original_hashes) > ORIGINAL_HASH_CACHE_SIZE:
+            _original_hashes.popitem(last=False)
+
+
+def _known_hash(original_path):
+    with _hash_lock:
+        return _original_hashes.get(original_path)
 
-def process_remote_decay(storage_path: str, current_health: float):
+
+def _stem(original_path: str) -> str:
+    return original_path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+
+def frame_path(original_path: str, bucket: int) -> str:
+    """Where the frame of an original at a given bucket lives: frames/<name>/<bucket>.jpg"""
+    return f"frames/{_stem(original_path)}/{bucket}.jpg"
+
+
+def working_path(original_path: str) -> str:
+    """Where the downscaled working copy of an original lives: working/<name>.jpg"""
+    return f"working/{_stem(original_path)}.jpg"
+
+
+def carrier_path(original_path: str) -> str:
+    """Where the PNG hiding an original's secret lives, in SECRETS_BUCKET_NAME: carriers/<name>.png"""
+    return f"carriers/{_stem(original_path)}.png"
+
+
+def make_working_copy(source) -> bytes:
     """
-    Background Task: Downloads the image, applies bitrot in memory,
-    and re-uploads it to Supabase.
+    Downscales and re-encodes an upload (a path or file object) into the bounded-size
+    JPEG that is served at full integrity and that every frame is rendered from.
     """
-    # Safety checks
-    if not storage_path or not db.supabase:
-        return
+    with Image.open(source) as img:
+        img.draft("RGB", (WORKING_MAX_SIDE, WORKING_MAX_SIDE))  # JPEGs decode straight at reduced scale
+        img.thumbnail((WORKING_MAX_SIDE, WORKING_MAX_SIDE))
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=WORKING_JPEG_QUALITY)
+    return buffer.getvalue()
 
-    # Filter: Only decay files in the 'active/' folder
-    if "active/" not in storage_path:
-        return
 
-    try:
-        bucket_name = "bitloss-images"
-        
-        # 1. Download File (Bytes)
-        # print(f"Processing {storage_path}...")
-        file_data = db.supabase.storage.from_(bucket_name).download(storage_path)
-        
-        # 2. Apply Bitrot (In-Memory)
-        # Map 0-100 scale to 0.0-1.0 scale
-        integrity_ratio = max(0.01, current_health / 100.0)
-        rotted_data = bitrot.decay_bytes(file_data, integrity=integrity_ratio)
-        
-        # 3. Upload Result (Overwrite)
-        db.supabase.storage.from_(bucket_name).upload(
-            storage_path,
-            rotted_data,
-            file_options={"x-upsert": "true", "content-type": "image/jpeg"}
-        )
-        # print(f"SUCCESS: Rotted {storage_path}")
+def public_url(storage_path: str) -> str:
+    """The URL clients load a stored file from."""
+    return f"{db.url}/storage/v1/object/public/{BUCKET_NAME}/{storage_path}"
+
+
+def all_frame_paths(original_path: str):
+    """Every frame path an original can have (used by the Reaper to clean up)."""
+    return [frame_path(original_path, bucket) for bucket in range(integrity_bucket(100.0) + 1)]
 
+
+def current_frame_bucket(storage_path: str):
+    """The bucket the served file represents. A fresh upload ('working/', legacy 'active/') is pristine."""
+    if storage_path.startswith("frames/"):
+        try:
+            return int(storage_path.rsplit("/", 1)[-1].split(".")[0])
+        except ValueError:
+            return None
+    if storage_path.startswith("working/") or "active/" in storage_path:
+        return integrity_bucket(100.0)
+    return None
+
+
+def render_frame(original: bytes, bucket: int) -> bytes:
+    """
+    Pure render: the frame for a bucket is derived only from the pristine source
+    (the working copy, or the original for legacy uploads).
+    Neither bitrot's pipeline (downscale + JPEG) nor the tile renderer (content-seeded
+    tile order) has randomness, so the same inputs always give the same bytes and
+    frames can be rendered anywhere, in any order.
+    """
+    if tile_decay.should_use_tiles(original):
+        # Large sources: only the tiles that rotted since the previous bucket are reworked
+        return tile_decay.render(original, bucket_integrity(bucket))
+    integrity_ratio = max(0.01, bucket_integrity(bucket) / 100.0)
+    return bitrot.decay_bytes(original, integrity=integrity_ratio)
+
+
+def _download_source(original_path: str) -> bytes:
+    """The working copy when there is one; images uploaded before working copies use their original."""
+    storage = db.supabase.storage.from_(BUCKET_NAME)
+    if original_path not in _no_working_copy:
+        try:
+            source = db.timed(storage.download, working_path(original_path))
+            metrics.storage_bytes.inc(len(source), direction="in")
+            return source
+        except Exception as e:
+            if "not found" not in str(e).lower() and "404" not in str(e):
+                raise
+            _no_working_copy.add(original_path)
+    source = db.timed(storage.download, original_path)
+    metrics.storage_bytes.inc(len(source), direction="in")
+    return source
+
+
+def load_frame(original_path: str, bucket: int, render=render_frame) -> bytes:
+    """
+    Returns a frame's bytes from the render cache, rendering it on a miss.
+    `render` does the CPU work and can be swapped for one that runs in a process pool.
+    """
+    digest = _known_hash(original_path)
+    if digest:
+        cached = render_cache.get((digest, bucket))
+        if cached is not None:
+            return cached
+
+    original = _download_source(original_path)
+    digest = hashlib.sha256(original).hexdigest()
+    _remember_hash(original_path, digest)
+
+    cached = render_cache.get((digest, bucket))
+    if cached is not None:
+        return cached
+
+    rotted = render(original, bucket)
+    render_cache.put((digest, bucket), rotted)
+    return rotted
+
+
+def ensure_frame(original_path: str, bucket: int, render=render_frame) -> str:
+    """
+    Makes sure a frame exists in storage and returns its path.
+    Frames are write-once: an 'already exists' answer means another pass got there
+    first, and since frames are deterministic its bytes are identical to ours.
+    A missing frame can always be regenerated by calling this again.
+    """
+    path = frame_path(original_path, bucket)
+    frame = load_frame(original_path, bucket, render)
+    try:
+        db.timed(db.supabase.storage.from_(BUCKET_NAME).upload, path, frame, file_options={"content-type": "image/jpeg"})
+        metrics.storage_bytes.inc(len(frame), direction="out")
     except Exception as e:
-        print(f"DECAY ERROR for {storage_path}: {e}")
\ No newline at end of file
+        if "exist" not in str(e).lower() and "duplicate" not in str(e).lower():
+            raise
+    return path
+
+
+def target_bucket(storage_path: str, current_health: float):
+    """
+    The bucket an image should be served at, or None if the served file is already right
+    (or is not something we rot, e.g. an archived original).
+    """
+    if not storage_path:
+        return None
+    served_bucket = current_frame_bucket(storage_path)
+    bucket = integrity_bucket(current_health)
+    if served_bucket is None or bucket == served_bucket:
+        return None
+    return bucket
+
@@ -0,0 +1,276 @@
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import cleanup
+import database as db
+import decay
+import decay_queue
+import fanout
+from schemas import DECAY_COLUMNS
+
+# --- CONFIG ---
+DECAY_TICK_SECONDS = 30
+SCAN_PAGE_SIZE = 1000
+BASE_DECAY_PER_SECOND = 0.05 / 3600.0
+KILL_REWARD = 100
+
+# --- WITNESS LEDGER ---
+# Which viewers saw which posts since the last tick: {post_id: {viewer_id, ...}}.
+# The feed only appends here; the tick drains it to pay out viewer rewards.
+_witness_lock = threading.Lock()
+_witnesses = {}
+
+
+def decay_rate(witnesses, generations):
+    """Integrity lost per second. More eyes and more generations rot faster. Works on scalars and arrays."""
+    return BASE_DECAY_PER_SECOND * (1 + (witnesses / 50)) * (1 + (generations / 20))
+
+
+def parse_timestamp(value, default):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() if value else default
+    except Exception:
+        return default
+
+
+def to_epochs(values, default):
+    """
+    ISO timestamps -> float epoch seconds, in one NumPy conversion.
+    Supabase returns UTC ('+00:00' / 'Z'), so the offset is dropped before parsing.
+    Falls back to per-row parsing if any value is in an unexpected format.
+    """
+    cleaned = [v.replace('Z', '').replace('+00:00', '') if v else 'NaT' for v in values]
+    try:
+        if any('+' in v or '-' in v[10:] for v in cleaned):
+            raise ValueError("non-UTC offset")
+        stamps = np.array(cleaned, dtype='datetime64[us]')
+    except ValueError:
+        return np.array([parse_timestamp(v, default) for v in values], dtype=np.float64)
+    epochs = stamps.astype(np.int64) / 1e6
+    return np.where(np.isnat(stamps), default, epochs)
+
+
+def decay_loss(last_viewed, witnesses, generations, now):
+    """
+    Decay Kernel: integrity each post lost between its last tick and `now`, in one
+    vectorized pass. Args are equal-length columns (last_viewed as epoch seconds).
+    """
+    elapsed = np.maximum(0.0, now - np.asarray(last_viewed, dtype=np.float64))
+    return decay_rate(np.asarray(witnesses, dtype=np.float64), np.asarray(generations, dtype=np.float64)) * elapsed
+
+
+def compute_decay(last_viewed, witnesses, generations, integrity, now, destroyed=None):
+    """
+    Integrity of each post at `now` (never below zero), from the same columns plus
+    its integrity at the last tick. Posts already flagged in `destroyed` are left untouched.
+    """
+    integrity = np.asarray(integrity, dtype=np.float64)
+    new_integrity = np.maximum(0.0, integrity - decay_loss(last_viewed, witnesses, generations, now))
+    if destroyed is not None:
+        new_integrity = np.where(np.asarray(destroyed, dtype=bool), integrity, new_integrity)
+    return new_integrity
+
+
+def _rate_columns(rows, now):
+    return (
+        to_epochs([row.get('last_viewed') for row in rows], now),
+        [row.get('witnesses') or 0 for row in rows],
+        [row.get('generations') or 0 for row in rows],
+    )
+
+
+def loss_columns(rows, now):
+    """Runs the kernel over a list of image rows: what each lost since its last tick."""
+    return decay_loss(*_rate_columns(rows, now), now)
+
+
+def decay_columns(rows, now):
+    """Runs the kernel over a list of image rows: the integrity of each at `now`."""
+    return compute_decay(
+        *_rate_columns(rows, now),
+        [row.get('bit_integrity', 100.0) for row in rows],
+        now,
+        destroyed=[bool(row.get('is_destroyed')) for row in rows],
+    )
+
+
+def project_integrity(rows, now=None):
+    """
+    Read-only view of integrity at `now` for a page of posts, extrapolated from the last tick.
+    Lets the feed show smooth decay without writing anything.
+    """
+    if not rows: return []
+    now = now if now is not None else time.time()
+    return decay_columns(rows, now).tolist()
+
+
+def note_witnesses(post_ids, viewer_id=None):
+    """
+    Called by /feed for every post it returns to a logged-in viewer.
+    The tick pays each noted viewer for the rot of the posts they saw.
+    """
+    if not post_ids or not viewer_id: return
+    with _witness_lock:
+        for post_id in post_ids:
+            _witnesses.setdefault(post_id, set()).add(viewer_id)
+
+
+def _take_local_witnesses():
+    global _witnesses
+    with _witness_lock:
+        drained, _witnesses = _witnesses, {}
+    return drained
+
+
+def share_witnesses():
+    """
+    Workers that are not running the tick hand their witnesses to the leader
+    through the witness_ledger table (sql/leader.sql).
+    """
+    if not db.supabase: return
+    local = _take_local_witnesses()
+    rows = [{"image_id": pid, "user_id": uid} for pid, viewers in local.items() for uid in viewers]
+    if not rows: return
+    try:
+        db.execute(db.supabase.table("witness_ledger").upsert(rows, ignore_duplicates=True))
+    except Exception as e:
+        print(f"DECAY ENGINE: could not share witnesses: {e}")
+
+
+def _drain_witnesses():
+    """This worker's witnesses plus everything other workers shared since the last tick."""
+    drained = _take_local_witnesses()
+    try:
+        shared = db.execute(db.supabase.rpc("drain_witness_ledger", {})).data or []
+    except Exception as e:
+        print(f"DECAY ENGINE: could not drain shared witnesses: {e}")
+        shared = []
+    for row in shared:
+        drained.setdefault(row['image_id'], set()).add(row['user_id'])
+    return drained
+
+
+def _fetch_living_images():
+    """Pages through every image that can still decay."""
+    rows = []
+    last_id = None
+    while True:
+        query = db.supabase.table("images").select(DECAY_COLUMNS)\
+            .eq("is_archived", False)\
+            .eq("is_destroyed", False)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = db.execute(query.order("id").limit(SCAN_PAGE_SIZE)).data or []
+        rows.extend(page)
+        if len(page) < SCAN_PAGE_SIZE:
+            return rows
+        last_id = page[-1]['id']
+
+
+def _set_frame_paths(frames):
+    """Points images at frames the render workers finished, skipping any archived since."""
+    if not frames: return
+    post_ids = list(frames)
+    db.execute(db.supabase.rpc("set_frame_paths", {
+        "image_ids": post_ids,
+        "paths": [frames[pid] for pid in post_ids]
+    }))
+
+
+def run_decay_tick():
+    """
+    The Decay Engine:
+    1. Works out what every living image lost since the last tick with the decay
+       kernel, and subtracts it in place in one statement (advance_decay,
+       sql/decay_engine.sql), so heals, kills and archives that land mid-tick
+       are never overwritten.
+    2. Queues frame renders for images that crossed an integrity bucket, and
+       points images at frames the render workers finished since the last tick.
+    3. Pushes visible integrity changes and deaths to connected clients and the
+       trending index, and deaths to the Reaper.
+    4. Pays authors for deaths and viewers for the rot they witnessed.
+    Deaths are only flagged (is_destroyed); archiving is left to the Reaper.
+    """
+    if not db.supabase: return
+
+    try:
+        witnessed = _drain_witnesses()
+        living = _fetch_living_images()
+        if not living: return
+        now = time.time()
+        rows = db.execute(db.supabase.rpc("advance_decay", {
+            "image_ids": [row['id'] for row in living],
+            "losses": loss_columns(living, now).tolist(),
+            "p_tick_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        })).data or []
+
+        finished_frames = decay_queue.take_results()
+        new_frames = {}
+        rewards = {}  # {user_id: [credits, kills]}
+        deferred = 0
+        dead_ids = []
+        changes = []  # Deltas pushed to connected clients
+        trending_rows = []
+
+        for row in rows:
+            integrity = float(row['new_integrity'])
+            is_dead = bool(row['died'])
+            credit_delta = max(0, math.floor(row['old_integrity']) - math.floor(integrity))
+
+            # Pixel decay: frames rendered since the last tick are switched in now,
+            # and images that changed bucket are queued for the render workers
+            storage_path = finished_frames.get(row['id'], row.get('storage_path'))
+            if storage_path != row.get('storage_path'):
+                new_frames[row['id']] = storage_path
+            if not decay_queue.submit(row['id'], storage_path, integrity, row.get('original_storage_path')):
+                deferred += 1
+
+            # Clients and the trending index only hear about what they can see: the
+            # whole percent, a new frame, or a death. Most ticks move a post by a
+            # fraction of a point, and the feed card animates between updates.
+            new_image = storage_path != row.get('storage_path')
+            if credit_delta > 0 or new_image or is_dead:
+                trending_rows.append((row['id'], row.get('username'), row.get('generations') or 0, integrity))
+                change = {"id": row['id'], "bitIntegrity": integrity}
+                if new_image:
+                    change["image"] = decay.public_url(storage_path)
+                changes.append(change)
+
+            author_id = row.get('uploader_id')
+            if is_dead:
+                dead_ids.append(row['id'])
+                if author_id:
+                    rewards.setdefault(author_id, [0, 0])[0] += KILL_REWARD
+
+            for viewer_id in witnessed.get(row['id'], ()):
+                reward = rewards.setdefault(viewer_id, [0, 0])
+                reward[0] += credit_delta
+                if is_dead and author_id and viewer_id != author_id:
+                    reward[0] += KILL_REWARD
+                    reward[1] += 1
+
+        if dead_ids:
+            print(f"DECAY ENGINE: {len(dead_ids)} artifacts destroyed this tick.")
+        if deferred:
+            print(f"DECAY ENGINE: render queue full, {deferred} frames deferred to the next tick.")
+
+        _set_frame_paths(new_frames)
+
+        # The tick runs on the leader only; fanout.py carries it to every worker
+        if changes:
+            fanout.publish("integrity", changes)
+        fanout.update_trending(trending_rows)
+        if dead_ids:
+            fanout.publish("death", dead_ids)
+            cleanup.report_deaths(dead_ids)
+
+        payouts = {uid: reward for uid, reward in rewards.items() if reward[0] > 0 or reward[1] > 0}
+        db.apply_rewards(payouts)
+        fanout.invalidate_users(payouts)
+
+    except Exception as e:
+        print(f"DECAY ENGINE ERROR: {e}")
@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import decay
+import metrics
+
+# --- CONFIG ---
+MAX_PENDING_JOBS = 1000                               # Backpressure: submits beyond this are refused
+WORKER_PROCESSES = max(1, (os.cpu_count() or 2) - 1)  # Leave one core for request handling
+
+# --- STATE ---
+# Pending jobs are keyed by storage_path: a newer job for the same image replaces
+# the older one, because only the latest integrity matters.
+_lock = threading.Lock()
+_pending = OrderedDict()   # {storage_path: job}
+_in_flight = {}            # {storage_path: bucket}
+_results = {}              # {post_id: frame path} waiting to be written by the decay engine
+_stats = {
+    "submitted": 0,
+    "deduplicated": 0,
+    "rejected": 0,
+    "completed": 0,
+    "failed": 0,
+    "total_seconds": 0.0,
+    "last_seconds": 0.0,
+}
+
+# One single-process executor per worker rather than one shared pool: every render
+# of a source lands in the same process, where its tile state (tile_decay.py) is.
+_pools = []
+_loop = None
+_wakeup = None
+_workers = []
+
+
+def submit(post_id, storage_path, integrity, original_path=None):
+    """
+    Queues a frame render for an image if its integrity moved to another bucket.
+    Returns False when the queue is full; the decay engine simply tries again next tick.
+    """
+    bucket = decay.target_bucket(storage_path, integrity)
+    if bucket is None:
+        return True
+
+    job = {
+        "post_id": post_id,
+        "storage_path": storage_path,
+        "original_path": original_path or storage_path.replace("active/", "originals/"),
+        "bucket": bucket,
+    }
+    with _lock:
+        if _in_flight.get(storage_path) == bucket:
+            return True
+        if storage_path in _pending:
+            _stats["deduplicated"] += 1
+        elif len(_pending) >= MAX_PENDING_JOBS:
+            _stats["rejected"] += 1
+            return False
+        _pending[storage_path] = job
+        _stats["submitted"] += 1
+
+    if _loop and _wakeup:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    return True
+
+
+def take_results():
+    """Hands finished frame paths to the caller (the decay engine) and clears them."""
+    global _results
+    with _lock:
+        finished, _results = _results, {}
+    return finished
+
+
+def stats():
+    """Queue depth and job timings, for logging and metrics."""
+    with _lock:
+        done = _stats["completed"] + _stats["failed"]
+        return {
+            **_stats,
+            "depth": len(_pending),
+            "in_flight": len(_in_flight),
+            "avg_seconds": _stats["total_seconds"] / done if done else 0.0,
+        }
+
+
+def _next_job():
+    with _lock:
+        if not _pending:
+            return None
+        storage_path, job = _pending.popitem(last=False)
+        _in_flight[storage_path] = job["bucket"]
+        return job
+
+
+def pool_for(original_path, pools=None):
+    """The worker process that renders a source. Stable for the life of the pools."""
+    pools = pools or _pools
+    return pools[zlib.crc32(original_path.encode()) % len(pools)]
+
+
+def _render_in_pool(pool, original, bucket):
+    """Runs the CPU-bound part of a render in a worker process (called from a thread)."""
+    return pool.submit(decay.render_frame, original, bucket).result()
+
+
+async def _worker():
+    while True:
+        job = _next_job()
+        if job is None:
+            _wakeup.clear()
+            await _wakeup.wait()
+            continue
+
+        start = time.perf_counter()
+        try:
+            # Storage I/O runs on a thread; only the render itself crosses into the process pool
+            render = functools.partial(_render_in_pool, pool_for(job["original_path"]))
+            frame = await asyncio.to_thread(decay.ensure_frame, job["original_path"], job["bucket"], render)
+            outcome = "completed"
+        except Exception as e:
+            print(f"DECAY QUEUE ERROR for {job['storage_path']}: {e}")
+            frame = None
+            outcome = "failed"
+
+        elapsed = time.perf_counter() - start
+        metrics.decay_job_latency.observe(elapsed, outcome=outcome)
+        with _lock:
+            _in_flight.pop(job["storage_path"], None)
+            if frame:
+                _results[job["post_id"]] = frame
+            _stats[outcome] += 1
+            _stats["total_seconds"] += elapsed
+            _stats["last_seconds"] = elapsed
+
+
+async def start():
+    global _pools, _loop, _wakeup, _workers
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _pools = [ProcessPoolExecutor(max_workers=1) for _ in range(WORKER_PROCESSES)]
+    _workers = [asyncio.create_task(_worker()) for _ in range(WORKER_PROCESSES)]
+
+
+async def stop():
+    global _pools, _workers
+    for task in _workers:
+        task.cancel()
+    for task in _workers:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _workers = []
+    for pool in _pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools = []
@@ -0,0 +1,484 @@
+"""
+In-memory stand-in for the subset of the Supabase client this backend uses:
+table().select/eq/neq/gt/lt/in_/or_/order/limit/insert/update/upsert/delete,
+rpc() for the functions in sql/, storage.from_().upload/download/remove and
+auth.get_user. Every round trip can be given an artificial latency so
+benchmarks see realistic concurrency.
+
+Used by bench_load.py; nothing in the app imports it.
+
+    fake = FakeDatabase(latency=0.005)
+    adb.supabase = fake.client()                     # async, like database_async
+    db.supabase = fake.client(asynchronous=False)    # sync, like database
+"""
+import asyncio
+import copy
+import itertools
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeError(Exception):
+    pass
+
+
+# --- FILTERS ---
+
+def _coerce(value):
+    """PostgREST filter values arrive as strings; compare them like the column's type."""
+    if isinstance(value, str):
+        stripped = value.strip('"')
+        if stripped in ("true", "false"):
+            return stripped == "true"
+        return stripped
+    return value
+
+
+def _compare(left, op, right):
+    if isinstance(right, str):
+        right = _coerce(right)
+        if isinstance(left, (int, float)) and not isinstance(left, bool) and isinstance(right, str):
+            right = float(right)
+    if left is None or right is None:
+        return (left == right) if op == "eq" else (left != right) if op == "neq" else False
+    return {
+        "eq": lambda: left == right,
+        "neq": lambda: left != right,
+        "gt": lambda: left > right,
+        "gte": lambda: left >= right,
+        "lt": lambda: left < right,
+        "lte": lambda: left <= right,
+    }[op]()
+
+
+def _split_top_level(text):
+    """Splits 'a,and(b,c),d' on commas that are not inside parentheses or quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _or_predicate(expression):
+    """Parses PostgREST logic trees like 'a.lt.1,and(a.eq.1,b.lt."x")' into a row predicate."""
+    def parse(term):
+        match = re.fullmatch(r"(and|or)\((.*)\)", term)
+        if match:
+            children = [parse(child) for child in _split_top_level(match.group(2))]
+            combine = all if match.group(1) == "and" else any
+            return lambda row: combine(child(row) for child in children)
+        column, op, value = term.split(".", 2)
+        return lambda row: _compare(row.get(column), op, value)
+
+    branches = [parse(term) for term in _split_top_level(expression)]
+    return lambda row: any(branch(row) for branch in branches)
+
+
+# --- TABLES ---
+
+class FakeQuery:
+    """Chainable query builder; execute() is one round trip."""
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = None
+        self.payload = None
+        self.predicates = []
+        self.ordering = []
+        self.max_rows = None
+        self.ignore_duplicates = False
+        self.single_row = False
+
+    # Actions
+    def select(self, columns="*", **kwargs):
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def update(self, payload, **kwargs):
+        self.action, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload, ignore_duplicates=False, **kwargs):
+        self.action, self.payload, self.ignore_duplicates = "upsert", payload, ignore_duplicates
+        return self
+
+    def delete(self, **kwargs):
+        self.action = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column, op, value):
+        self.predicates.append(lambda row: _compare(row.get(column), op, value))
+        return self
+
+    def eq(self, column, value): return self._filter(column, "eq", value)
+    def neq(self, column, value): return self._filter(column, "neq", value)
+    def gt(self, column, value): return self._filter(column, "gt", value)
+    def gte(self, column, value): return self._filter(column, "gte", value)
+    def lt(self, column, value): return self._filter(column, "lt", value)
+    def lte(self, column, value): return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        wanted = set(values)
+        self.predicates.append(lambda row: row.get(column) in wanted)
+        return self
+
+    def or_(self, expression, **kwargs):
+        self.predicates.append(_or_predicate(expression))
+        return self
+
+    # Shaping
+    def order(self, column, desc=False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.max_rows = count
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    maybe_single = single
+
+    def execute(self):
+        return self.client.round_trip(lambda: self.client.db.run_query(self))
+
+
+class FakeRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        return self.client.round_trip(lambda: self.client.db.run_rpc(self.name, self.params))
+
+
+# --- STORAGE / AUTH ---
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def upload(self, path, file, file_options=None):
+        data = file if isinstance(file, bytes) else file.read()
+        return self.client.round_trip(lambda: self.client.db.storage_put(self.name, path, data))
+
+    def download(self, path):
+        return self.client.round_trip(lambda: self.client.db.storage_get(self.name, path))
+
+    def remove(self, paths):
+        return self.client.round_trip(lambda: self.client.db.storage_remove(self.name, paths))
+
+
+class FakeStorage:
+    def __init__(self, client):
+        self.client = client
+
+    def from_(self, name):
+        return FakeBucket(self.client, name)
+
+
+class FakeAuth:
+    def __init__(self, client):
+        self.client = client
+
+    def get_user(self, token):
+        def lookup():
+            user_id = self.client.db.tokens.get(token)
+            user = type("User", (), {"id": user_id})() if user_id else None
+            return type("UserResponse", (), {"user": user})()
+        return self.client.round_trip(lookup)
+
+
+class FakeClient:
+    """One client view over a FakeDatabase; async like AsyncClient or sync like Client."""
+    def __init__(self, db, asynchronous=True):
+        self.db = db
+        self.asynchronous = asynchronous
+        self.storage = FakeStorage(self)
+        self.auth = FakeAuth(self)
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params)
+
+    def round_trip(self, operation):
+        if self.asynchronous:
+            return self._async_round_trip(operation)
+        self.db.count_call()
+        if self.db.latency:
+            time.sleep(self.db.latency)
+        return self.db.locked(operation)
+
+    async def _async_round_trip(self, operation):
+        self.db.count_call()
+        if self.db.latency:
+            await asyncio.sleep(self.db.latency)
+        return self.db.locked(operation)
+
+
+class FakeDatabase:
+    """
+    The shared state behind every fake client: tables, storage objects and auth tokens.
+    `calls` counts every round trip (queries, RPCs, storage and auth calls alike).
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self.objects = {}   # {(bucket, path): bytes}
+        self.tokens = {}    # {access token: user id}
+        self.calls = 0
+        self._lock = threading.RLock()
+        self._serial = itertools.count(1)  # Identity column of fanout_events
+
+    def client(self, asynchronous=True):
+        return FakeClient(self, asynchronous)
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def locked(self, operation):
+        with self._lock:
+            return operation()
+
+    # --- Tables ---
+    def rows(self, table):
+        return self.tables.setdefault(table, [])
+
+    def run_query(self, query):
+        rows = self.rows(query.table)
+        matches = [row for row in rows if all(p(row) for p in query.predicates)]
+
+        if query.action == "insert":
+            result = [self._insert(query.table, item) for item in _as_list(query.payload)]
+        elif query.action == "update":
+            for row in matches:
+                row.update(copy.deepcopy(query.payload))
+            result = matches
+        elif query.action == "upsert":
+            result = [self._upsert(query.table, item, query.ignore_duplicates) for item in _as_list(query.payload)]
+            result = [row for row in result if row is not None]
+        elif query.action == "delete":
+            doomed = {id(row) for row in matches}
+            self.tables[query.table] = [row for row in rows if id(row) not in doomed]
+            result = matches
+        else:
+            result = matches
+            for column, desc in reversed(query.ordering):
+                result = sorted(result, key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            if query.max_rows is not None:
+                result = result[:query.max_rows]
+
+        if query.columns:
+            result = [{c: row.get(c) for c in query.columns} for row in result]
+        else:
+            result = [dict(row) for row in result]
+        if query.single_row:
+            return FakeResponse(result[0] if result else None)
+        return FakeResponse(result)
+
+    def _insert(self, table, item):
+        row_id = next(self._serial) if table == "fanout_events" else str(uuid.uuid4())
+        row = {"id": row_id, "created_at": _now(), **copy.deepcopy(item)}
+        self.rows(table).append(row)
+        return row
+
+    def _upsert(self, table, item, ignore_duplicates):
+        key = self._conflict_key(table, item)
+        for row in self.rows(table):
+            if all(row.get(column) == item.get(column) for column in key):
+                if ignore_duplicates:
+                    return None
+                row.update(copy.deepcopy(item))
+                return row
+        return self._insert(table, item)
+
+    @staticmethod
+    def _conflict_key(table, item):
+        if table == "witness_ledger":
+            return ("image_id", "user_id")
+        if table == "leases":
+            return ("name",)
+        return ("id",)
+
+    def find(self, table, row_id):
+        return next((row for row in self.rows(table) if row.get("id") == row_id), None)
+
+    # --- RPCs (mirrors of sql/*.sql) ---
+    def run_rpc(self, name, params):
+        handler = getattr(self, f"_rpc_{name}", None)
+        if handler is None:
+            raise FakeError(f"Could not find the function {name}")
+        return FakeResponse(handler(**params))
+
+    def _rpc_add_witnesses(self, image_ids, amounts):
+        for image_id, amount in zip(image_ids, amounts):
+            row = self.find("images", image_id)
+            if row and not row.get("is_archived"):
+                row["witnesses"] = (row.get("witnesses") or 0) + amount
+                row["generations"] = (row.get("generations") or 0) + amount
+
+    def _rpc_advance_decay(self, image_ids, losses, p_tick_at):
+        advanced = []
+        for image_id, lost in zip(image_ids, losses):
+            row = self.find("images", image_id)
+            if not row or row.get("is_archived") or row.get("is_destroyed"):
+                continue
+            old = row.get("bit_integrity", 100.0)
+            new = max(0.0, old - lost)
+            row.update(bit_integrity=new, current_quality=new, is_destroyed=new <= 0, last_viewed=p_tick_at)
+            advanced.append({key: row.get(key) for key in ("id", "uploader_id", "username", "storage_path",
+                                                           "original_storage_path", "generations")})
+            advanced[-1].update(old_integrity=old, new_integrity=new, died=new <= 0)
+        return advanced
+
+    def _rpc_set_frame_paths(self, image_ids, paths):
+        for image_id, path in zip(image_ids, paths):
+            row = self.find("images", image_id)
+            if row and not row.get("is_archived"):
+                row["storage_path"] = path
+
+    def _rpc_archive_images(self, image_ids, paths):
+        for image_id, path in zip(image_ids, paths):
+            row = self.find("images", image_id)
+            if row:
+                row.update(storage_path=path, is_archived=True, witnesses=0)
+
+    def _rpc_latest_comments(self, post_ids, per_post):
+        wanted = set(post_ids)
+        by_post = {}
+        for row in self.rows("comments"):
+            if row.get("post_id") in wanted:
+                by_post.setdefault(row["post_id"], []).append(row)
+        result = []
+        for rows in by_post.values():
+            rows.sort(key=lambda row: (row["created_at"], str(row["id"])), reverse=True)
+            result.extend({**copy.deepcopy(row), "total": len(rows)} for row in rows[:per_post])
+        return result
+
+    def _rpc_increment_credits(self, p_user_id, p_amount):
+        user = self.find("users", p_user_id)
+        if user is None or (user.get("credits") or 0) + p_amount < 0:
+            return None
+        user["credits"] = (user.get("credits") or 0) + p_amount
+        return user["credits"]
+
+    def _rpc_increment_score(self, p_user_id, p_points, p_kills=0):
+        user = self.find("users", p_user_id)
+        if user:
+            user["entropy_score"] = (user.get("entropy_score") or 0) + p_points
+            user["kills"] = (user.get("kills") or 0) + p_kills
+
+    def _rpc_apply_rewards(self, p_user_ids, p_credits, p_kills):
+        for user_id, credits, kills in zip(p_user_ids, p_credits, p_kills):
+            user = self.find("users", user_id)
+            if user:
+                user["credits"] = (user.get("credits") or 0) + credits
+                user["kills"] = (user.get("kills") or 0) + kills
+
+    def _rpc_apply_interaction(self, p_user_id, p_image_id, p_action, p_cost=10):
+        if p_action not in ("heal", "corrupt"):
+            return {"status": "invalid_action"}
+        image = self.find("images", p_image_id)
+        if image is None:
+            return {"status": "not_found"}
+        user = self.find("users", p_user_id)
+        if user is None or (user.get("credits") or 0) < p_cost:
+            return {"status": "insufficient_funds"}
+        user["credits"] -= p_cost
+        integrity = image.get("bit_integrity", 100.0)
+        integrity = min(100.0, integrity + 5.0) if p_action == "heal" else max(0.0, integrity - 5.0)
+        image.update(bit_integrity=integrity, current_quality=integrity,
+                     generations=(image.get("generations") or 0) + 1,
+                     is_destroyed=bool(image.get("is_destroyed")) or integrity <= 0)
+        return {"status": "success", "new_integrity": integrity,
+                "remaining_credits": user["credits"], "destroyed": integrity <= 0}
+
+    def _rpc_reveal_secret(self, p_image_id, p_min_integrity):
+        image = self.find("images", p_image_id)
+        if image is None:
+            return {"status": "not_found"}
+        integrity = image.get("current_quality", 100.0)
+        if integrity < p_min_integrity:
+            return {"status": "too_low", "integrity": integrity}
+        secret = next((row for row in self.rows("image_secrets") if row.get("image_id") == p_image_id), None)
+        if secret is None:
+            return {"status": "no_secret"}
+        return {"status": "success", "secret_text": secret["secret_text"], "integrity": integrity,
+                "embedded": bool(secret.get("embedded")), "stego_seed": secret.get("stego_seed"),
+                "stego_redundancy": secret.get("stego_redundancy") or 20,
+                "carrier_path": secret.get("carrier_path")}
+
+    def _rpc_try_acquire_lease(self, p_name, p_holder, p_ttl_seconds):
+        now = datetime.utcnow()
+        lease = next((row for row in self.rows("leases") if row["name"] == p_name), None)
+        if lease and lease["holder"] != p_holder and lease["expires_at"] >= now:
+            return False
+        if lease is None:
+            lease = {"name": p_name}
+            self.rows("leases").append(lease)
+        lease.update(holder=p_holder, expires_at=now + timedelta(seconds=p_ttl_seconds))
+        return True
+
+    def _rpc_release_lease(self, p_name, p_holder):
+        self.tables["leases"] = [row for row in self.rows("leases")
+                                 if not (row["name"] == p_name and row["holder"] == p_holder)]
+
+    def _rpc_drain_witness_ledger(self):
+        drained, self.tables["witness_ledger"] = self.rows("witness_ledger"), []
+        return drained
+
+    # --- Storage ---
+    def storage_put(self, bucket, path, data):
+        if (bucket, path) in self.objects:
+            raise FakeError("The resource already exists")
+        self.objects[(bucket, path)] = bytes(data)
+        return {"path": path}
+
+    def storage_get(self, bucket, path):
+        if (bucket, path) not in self.objects:
+            raise FakeError("Object not found")
+        return self.objects[(bucket, path)]
+
+    def storage_remove(self, bucket, paths):
+        return [{"name": path} for path in paths if self.objects.pop((bucket, path), None) is not None]
+
+
+def _as_list(payload):
+    return payload if isinstance(payload, list) else [payload]
+
+
+def _now():
+    return datetime.utcnow().isoformat()
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import auth
+import broadcast
+import cache
+import database_async as adb
+import leader
+import reveal
+import trending
+
+# --- CONFIG ---
+POLL_SECONDS = 1.0          # How long an event from another worker can take to arrive...
+IDLE_POLL_SECONDS = 10.0    # ...or the first one after no worker shared anything for
+PEER_TIMEOUT_SECONDS = 120  # this long (a single worker never hears from anyone)
+POLL_LIMIT = 100            # Batches read per round trip
+OUTBOX_MAX_EVENTS = 5000    # Events kept while the table is unreachable; the oldest go first
+SETTLE_SECONDS = 5          # An event inserted this long ago is assumed to be committed
+RETENTION_SECONDS = 300     # The leader prunes events older than this
+
+# --- STATE ---
+# Streams, trending, the response cache, reveal's "too low" cache and cached
+# profiles all live in each worker's memory, while the decay tick and the sweep
+# run on the leader only and /interact runs wherever the request lands. Every
+# change to that state goes through here: it is applied locally at once and
+# queued for the fanout_events table (sql/leader.sql), which every worker polls.
+# Each flush writes one row holding everything queued since the last one.
+_lock = threading.Lock()
+_outbox = []        # [[kind, payload]] not yet written
+_floor = None       # Every batch at or below this id has been applied
+_seen = set()       # Batch ids above _floor already applied
+_marks = deque()    # [(monotonic time, highest id seen then)], to advance _floor
+_peer_seen = None   # Monotonic time another worker's batch last arrived
+_polled = None      # Monotonic time of the last poll
+
+
+def _publish(payload):
+    broadcast.publish(payload["event"], payload["data"])
+
+
+def _update_trending(rows):
+    for post_id, username, generations, integrity in rows:
+        trending.update(post_id, username, generations, integrity)
+
+
+def _bump_trending(payload):
+    trending.bump(payload["id"], payload["gained"], integrity=payload["integrity"])
+
+
+def _invalidate_users(user_ids):
+    for user_id in user_ids:
+        auth.invalidate_user(user_id)
+
+
+HANDLERS = {
+    "publish": _publish,
+    "trending": _update_trending,
+    "trending_bump": _bump_trending,
+    "trending_remove": trending.remove,
+    "invalidate": lambda names: cache.invalidate(*names),
+    "forget": reveal.forget,
+    "users": _invalidate_users,
+}
+
+
+def _share(kind, payload):
+    """Applies one change here and queues it for every other worker. Safe from any thread."""
+    HANDLERS[kind](payload)
+    with _lock:
+        _outbox.append([kind, payload])
+
+
+# --- API (same arguments as the local calls they replace) ---
+
+def publish(event, data):
+    """broadcast.publish on every worker."""
+    _share("publish", {"event": event, "data": data})
+
+
+def update_trending(rows):
+    """trending.update on every worker, for a list of (post_id, username, generations, integrity)."""
+    if rows:
+        _share("trending", [list(row) for row in rows])
+
+
+def bump_trending(post_id, gained=1, integrity=None):
+    _share("trending_bump", {"id": post_id, "gained": gained, "integrity": integrity})
+
+
+def remove_trending(post_ids):
+    if post_ids:
+        _share("trending_remove", list(post_ids))
+
+
+def invalidate_cache(*names):
+    _share("invalidate", list(names))
+
+
+def forget_reveal(post_id):
+    _share("forget", post_id)
+
+
+def invalidate_users(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        _share("users", user_ids)
+
+
+# --- RELAY ---
+
+async def flush():
+    """
+    Writes queued events as one row. A failed batch is retried on the next flush,
+    but at most OUTBOX_MAX_EVENTS are kept: beyond that the oldest are dropped and
+    the clients' resync and the caches' TTLs repair what they carried.
+    """
+    global _outbox
+    with _lock:
+        batch, _outbox = _outbox, []
+    if not batch or not adb.supabase:
+        return
+    try:
+        await adb.execute(adb.supabase.table("fanout_events").insert(
+            {"origin": leader.INSTANCE_ID, "events": batch}
+        ))
+    except Exception as e:
+        with _lock:
+            _outbox = batch + _outbox
+            dropped = max(0, len(_outbox) - OUTBOX_MAX_EVENTS)
+            del _outbox[:dropped]
+        print(f"FANOUT: could not share {len(batch)} events, retrying next time "
+              f"({dropped} oldest dropped): {e}")
+
+
+async def _start_floor():
+    """Starts after the newest event: what happened before this worker existed is not replayed."""
+    global _floor
+    res = await adb.execute(adb.supabase.table("fanout_events").select("id").order("id", desc=True).limit(1))
+    _floor = res.data[0]['id'] if res.data else 0
+
+
+async def poll():
+    """
+    Applies events other workers shared since the last poll.
+    Ids are handed out before commit, so a lower id can become visible after a
+    higher one: reads start from a floor that trails SETTLE_SECONDS behind, and
+    batches already applied above it are skipped.
+    """
+    global _peer_seen, _polled
+    if not adb.supabase: return
+    if _floor is None:
+        await _start_floor()
+    _polled = time.monotonic()
+
+    cursor = _floor
+    while True:
+        res = await adb.execute(
+            adb.supabase.table("fanout_events").select("id, origin, events")
+            .gt("id", cursor).order("id").limit(POLL_LIMIT)
+        )
+        rows = res.data or []
+        for row in rows:
+            if row['id'] in _seen:
+                continue
+            _seen.add(row['id'])
+            if row['origin'] == leader.INSTANCE_ID:
+                continue
+            _peer_seen = time.monotonic()
+            for kind, payload in row['events']:
+                try:
+                    HANDLERS[kind](payload)
+                except Exception as e:
+                    print(f"FANOUT: could not apply '{kind}' event: {e}")
+        if len(rows) < POLL_LIMIT:
+            break
+        cursor = rows[-1]['id']
+    _advance_floor()
+
+
+def _advance_floor():
+    global _floor, _seen
+    now = time.monotonic()
+    if _seen:
+        _marks.append((now, max(_seen)))
+    while _marks and _marks[0][0] <= now - SETTLE_SECONDS:
+        _floor = max(_floor, _marks.popleft()[1])
+    _seen = {event_id for event_id in _seen if event_id > _floor}
+
+
+def _poll_due(now):
+    """Polls every POLL_SECONDS while other workers are sharing, every IDLE_POLL_SECONDS otherwise."""
+    if _polled is None:
+        return True
+    if _peer_seen is not None and now - _peer_seen < PEER_TIMEOUT_SECONDS:
+        return True
+    return now - _polled >= IDLE_POLL_SECONDS
+
+
+async def run_relay():
+    """
+    Shares this worker's events every POLL_SECONDS and applies everyone else's
+    (started from lifespan). Nothing is lost while polling is idle: reads resume
+    from the floor, so the first event after a quiet spell is only late.
+    """
+    while True:
+        try:
+            await flush()
+            if _poll_due(time.monotonic()):
+                await poll()
+        except Exception as e:
+            print(f"FANOUT: relay failed: {e}")
+        await asyncio.sleep(POLL_SECONDS)
+
+
+async def run_pruner():
+    """Deletes events every worker has long since read (leader only, see leader.py)."""
+    while True:
+        await asyncio.sleep(RETENTION_SECONDS)
+        cutoff = (datetime.utcnow() - timedelta(seconds=RETENTION_SECONDS)).isoformat()
+        try:
+            await adb.execute(adb.supabase.table("fanout_events").delete().lt("created_at", cutoff))
+        except Exception as e:
+            print(f"FANOUT: prune failed: {e}")
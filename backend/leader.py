@@ -0,0 +1,135 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+
+import database_async as adb
+
+# --- CONFIG ---
+LEASE_TTL_SECONDS = 30     # How long a silent leader keeps the lease (failover time)
+RENEW_SECONDS = 10         # How often everyone tries to take or renew it
+MISSING_REMINDER_SECONDS = 600  # How often a missing sql/leader.sql is reported again
+BACKGROUND_LEASE = "background"
+
+# Unique per process, so several workers on one host are told apart
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class MemoryLeaseStore:
+    """
+    In-process stand-in for the leases table: same semantics, no database.
+    Only used when there is no database at all (local runs with a single process).
+    """
+    def __init__(self):
+        self._leases = {}  # {name: (holder, expires_at)}
+        self._lock = threading.Lock()
+
+    async def acquire(self, name, holder, ttl):
+        now = time.monotonic()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current[0] == holder or current[1] < now:
+                self._leases[name] = (holder, now + ttl)
+                return True
+            return False
+
+    async def release(self, name, holder):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == holder:
+                del self._leases[name]
+
+
+class PostgresLeaseStore:
+    """Lease row in Postgres (sql/leader.sql), shared by every worker and instance."""
+    async def acquire(self, name, holder, ttl):
+        res = await adb.execute(adb.supabase.rpc("try_acquire_lease", {
+            "p_name": name, "p_holder": holder, "p_ttl_seconds": ttl
+        }))
+        return bool(res.data)
+
+    async def release(self, name, holder):
+        await adb.execute(adb.supabase.rpc("release_lease", {"p_name": name, "p_holder": holder}))
+
+
+_store = None
+_leading = set()  # Lease names this process currently holds
+_missing_reported = None  # Monotonic time sql/leader.sql was last reported missing
+
+
+def is_leader(name=BACKGROUND_LEASE):
+    return name in _leading
+
+
+async def _acquire(name):
+    """
+    One election round. A store that cannot be reached counts as not leading,
+    and so does a database without the lease functions: an in-process lease
+    there would make every worker a leader.
+    """
+    global _store
+    if _store is None:
+        _store = PostgresLeaseStore() if adb.supabase else MemoryLeaseStore()
+    try:
+        return await _store.acquire(name, INSTANCE_ID, LEASE_TTL_SECONDS)
+    except Exception as e:
+        if "try_acquire_lease" in str(e):
+            _report_missing(name)
+        else:
+            print(f"LEADER: could not renew lease '{name}': {e}")
+        return False
+
+
+def _report_missing(name):
+    """Nothing runs the leader's loops until sql/leader.sql is applied, so say so loudly and keep saying it."""
+    global _missing_reported
+    now = time.monotonic()
+    if _missing_reported is not None and now - _missing_reported < MISSING_REMINDER_SECONDS:
+        return
+    _missing_reported = now
+    print("=" * 72)
+    print("❌ LEADER ERROR: the lease functions are missing from the database.")
+    print(f"❌ Nobody runs '{name}' (decay tick, safety sweep, fanout pruning) until they exist.")
+    print("❌ Apply backend/sql/leader.sql in the Supabase SQL editor (see README, Backend Setup).")
+    print("=" * 72)
+
+
+async def run_while_leader(name, *loops):
+    """
+    Runs the given coroutine functions only while this process holds the lease.
+    They are started when leadership is won and cancelled as soon as it is lost,
+    so at most one worker across all instances runs them at any time.
+    """
+    tasks = []
+    try:
+        while True:
+            leading = await _acquire(name)
+            if leading and not tasks:
+                print(f"LEADER: {INSTANCE_ID} now runs '{name}'")
+                _leading.add(name)
+                tasks = [asyncio.create_task(loop()) for loop in loops]
+            elif not leading and tasks:
+                print(f"LEADER: {INSTANCE_ID} lost '{name}', stopping its loops")
+                _leading.discard(name)
+                await _cancel(tasks)
+                tasks = []
+            await asyncio.sleep(RENEW_SECONDS)
+    finally:
+        _leading.discard(name)
+        await _cancel(tasks)
+        if _store is not None:
+            try:
+                await _store.release(name, INSTANCE_ID)
+            except Exception:
+                pass  # It expires on its own
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
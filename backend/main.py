@@ -1,24 +1,43 @@
 import asyncio
+import base64
 from contextlib import asynccontextmanager
+import json
 import os
 from pathlib import Path
 import random
+import tempfile
 import time
 from datetime import datetime
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, File, Form, Header, HTTPException, Request, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-import httpx
-
-# Custom/Third-Party Libraries
-import bitrot
-from ghosttag import GhostTag
 
 # Local Application Imports
-from cleanup import archive_dead_images
-import database as db
+import auth
+from auth import get_current_user
+import broadcast
+import cache
+import cleanup
+import comments
+import counters
+import database_async as adb
+import decay
+import decay_engine
+import decay_queue
+import fanout
+import leader
+import metrics
+import reveal
+import stego
+import trending
+from responses import CompactJSONResponse
+from schemas import (
+    ARCHIVE_COLUMNS, FEED_COLUMNS, GRAVEYARD_COLUMNS,
+    ArchiveItem, FeedPage, FeedPost, GraveyardItem,
+)
 
 # --- 1. ROBUST ENV LOADING ---
 env_path = Path(__file__).parent / ".env"
@@ -32,38 +51,56 @@ if not SUPABASE_URL:
 
 print(f"DEBUG: Loaded SUPABASE_URL: {SUPABASE_URL}")
 
-# --- SAFETY WRAPPER ---
-def safe_db_execute(query):
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            return query.execute()
-        except (httpx.RemoteProtocolError, httpx.ReadTimeout, httpx.ConnectTimeout):
-            if attempt < max_retries - 1:
-                print(f"⚠️ DB Connection unstable. Retrying ({attempt+1}/{max_retries})...")
-                time.sleep(0.2)
-            else:
-                print("❌ DB Connection failed after retries.")
-                raise 
-        except Exception as e:
-            raise e
-
 # --- LIFECYCLE ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await adb.connect()
+    broadcast.bind(asyncio.get_running_loop())
+
     print("SYSTEM: Initializing Reaper Protocol...")
-    async def reaper_loop():
+    reaper_task = asyncio.create_task(cleanup.run_reaper())
+
+    print("SYSTEM: Starting Decay Workers...")
+    await decay_queue.start()
+    await stego.start()
+
+    # Scans and the decay tick run on exactly one worker across all instances (leader.py)
+    print("SYSTEM: Starting Decay Engine...")
+    async def decay_loop():
         while True:
-            await archive_dead_images()
-            await asyncio.sleep(60)
-    reaper_task = asyncio.create_task(reaper_loop())
+            start = time.perf_counter()
+            await asyncio.to_thread(decay_engine.run_decay_tick)
+            metrics.decay_tick_latency.observe(time.perf_counter() - start)
+            await asyncio.sleep(decay_engine.DECAY_TICK_SECONDS)
+    async def witness_loop():
+        while True:
+            await asyncio.sleep(decay_engine.DECAY_TICK_SECONDS)
+            if not leader.is_leader():
+                await asyncio.to_thread(decay_engine.share_witnesses)
+    leader_task = asyncio.create_task(
+        leader.run_while_leader(leader.BACKGROUND_LEASE, decay_loop, cleanup.run_safety_sweep, fanout.run_pruner)
+    )
+    witness_task = asyncio.create_task(witness_loop())
+    counters_task = asyncio.create_task(counters.run_flusher())
+    trending_task = asyncio.create_task(trending.run_refresher())
+    # Streams and in-memory indexes on every worker follow the leader's tick and each other's writes
+    fanout_task = asyncio.create_task(fanout.run_relay())
     yield 
-    print("SYSTEM: Shutting down Reaper...")
-    reaper_task.cancel()
-    try:
-        await reaper_task
-    except asyncio.CancelledError:
-        pass
+    print("SYSTEM: Shutting down Reaper and Decay Engine...")
+    background = (reaper_task, leader_task, witness_task, counters_task, trending_task, fanout_task)
+    for task in background:
+        task.cancel()
+    for task in background:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    # Buffered views must reach the database before the pool closes
+    await counters.flush()
+    await fanout.flush()
+    await decay_queue.stop()
+    await stego.stop()
+    await adb.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -84,6 +121,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- METRICS ---
+app.add_middleware(metrics.MetricsMiddleware)
+
+@metrics.register_gauges
+def _runtime_gauges():
+    queue = decay_queue.stats()
+    return (
+        metrics.gauge_lines("bitrot_decay_queue_jobs", "Decay render jobs by state.", [
+            ({"state": "pending"}, queue["depth"]),
+            ({"state": "in_flight"}, queue["in_flight"]),
+        ])
+        + metrics.gauge_lines("bitrot_decay_queue_total", "Decay render jobs since start, by outcome.", [
+            ({"outcome": outcome}, queue[outcome])
+            for outcome in ("submitted", "deduplicated", "rejected", "completed", "failed")
+        ], metric_type="counter")
+        + metrics.gauge_lines("bitrot_cache_requests_total", "Cache lookups since start.", [
+            ({"cache": name, "result": "hit"}, hits) for name, hits, _ in _cache_counts()
+        ] + [
+            ({"cache": name, "result": "miss"}, misses) for name, _, misses in _cache_counts()
+        ], metric_type="counter")
+        + metrics.gauge_lines("bitrot_cache_hit_ratio", "Share of cache lookups served from memory.", [
+            ({"cache": name}, round(hits / (hits + misses), 4) if hits + misses else 0)
+            for name, hits, misses in _cache_counts()
+        ])
+        + metrics.gauge_lines("bitrot_stream_clients", "Connected /stream clients.", [({}, broadcast.client_count())])
+        + metrics.gauge_lines("bitrot_unflushed_views", "Feed views buffered in memory, not yet written.", [({}, counters.pending_count())])
+        + metrics.gauge_lines("bitrot_leader", "1 when this worker runs the background loops.", [({}, int(leader.is_leader()))])
+    )
+
+def _cache_counts():
+    response_cache = cache.stats()
+    return [
+        ("response", response_cache["hits"], response_cache["misses"]),
+        ("render", decay.render_cache.hits, decay.render_cache.misses),
+        ("auth_claims", auth._claims.hits, auth._claims.misses),
+        ("auth_profiles", auth._profiles.hits, auth._profiles.misses),
+        ("reveal_too_low", reveal._too_low.hits, reveal._too_low.misses),
+        ("stego_results", stego._results.hits, stego._results.misses),
+    ]
+
 os.makedirs("static/images", exist_ok=True)
 app.mount("/images", StaticFiles(directory="static/images"), name="images")
 
@@ -92,49 +169,45 @@ class InteractRequest(BaseModel):
     post_id: str
     action: str 
 
-# --- HELPER: DECAY ---
-def process_remote_decay(storage_path: str, current_health: float):
-    if not storage_path or not db.supabase: return
-    try:
-        bucket_name = "bitloss-images"
-        file_data = db.supabase.storage.from_(bucket_name).download(storage_path)
-        integrity_ratio = max(0.01, current_health / 100.0)
-        rotted_data = bitrot.decay_bytes(file_data, integrity=integrity_ratio)
-        db.supabase.storage.from_(bucket_name).upload(
-            storage_path, rotted_data, file_options={"x-upsert": "true", "content-type": "image/jpeg"}
-        )
-    except Exception as e:
-        print(f"SKIPPING DECAY for {storage_path}: {e}")
+# --- HELPER: FEED CURSOR ---
+# Keyset pagination on (created_at, id), newest first (oldest first for /posts/{id}/comments).
+# The cursor is an opaque base64 token of the last row the client received.
+FEED_DEFAULT_LIMIT = 20
+FEED_MAX_LIMIT = 100
+
+def encode_feed_cursor(row):
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
 
-# --- HELPER: AUTH ---
-def get_current_user(request: Request):
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None
+def decode_feed_cursor(cursor: str):
     try:
-        token = auth_header.split(" ")[1]
-        user_response = db.supabase.auth.get_user(token)
-        if not user_response or not user_response.user:
-            return None
-        user_id = user_response.user.id
-        # Fetch public profile to get username
-        profile_res = db.supabase.table("users").select("*").eq("id", user_id).execute()
-        if profile_res.data:
-            return profile_res.data[0]
-        return None
-    except Exception as e:
-        print(f"AUTH ERROR: {str(e)}")
-        return None
+        created_at, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at, post_id = str(created_at), str(post_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Values are embedded in a PostgREST filter, so reject anything that could break out of quotes
+    if any(ch in created_at + post_id for ch in '"\\'):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, post_id
 
 # --- ROUTES ---
 
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/me")
-def get_my_identity(request: Request):
-    user = get_current_user(request)
+async def get_my_identity(request: Request):
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Not Authenticated")
     return user
 
+# --- UPLOAD LIMITS ---
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_FORM_OVERHEAD = 64 * 1024   # Room for the caption, secret and multipart boundaries
+
 @app.post("/upload")
 async def upload_image(
     request: Request,
@@ -142,43 +215,66 @@ async def upload_image(
     caption: str = Form(None),
     secret: str = Form(None)
 ):
-    if not db.supabase:
+    if not adb.supabase:
         raise HTTPException(status_code=503, detail="Database not connected")
 
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
          raise HTTPException(status_code=401, detail="Must be logged in to upload")
 
     author_username = user['username']
     author_id = user['id']
 
+    # Reject oversized bodies before reading anything
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    spool = None
     try:
-        file_bytes = await file.read()
-        
-        original_ext = file.filename.split('.')[-1]
-        file_ext = "png" if secret else original_ext 
+        # Stream the upload to disk in chunks: memory stays O(chunk) however big the file is
+        spool = tempfile.NamedTemporaryFile(delete=False)
+        received = 0
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            received += len(chunk)
+            if received > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="File too large")
+            spool.write(chunk)
+        spool.close()
+
+        file_ext = file.filename.split('.')[-1]
         
         unique_id = f"{int(time.time())}_{random.randint(100, 999)}"
         filename = f"{unique_id}.{file_ext}"
 
-        active_path = f"active/{filename}"      
-        original_path = f"originals/{filename}" 
+        original_path = f"originals/{filename}"
+        working_path = decay.working_path(original_path)
 
-        db.supabase.storage.from_("bitloss-images").upload(
-            active_path,
-            file_bytes,
-            file_options={"content-type": f"image/{file_ext}"}
-        )
-        db.supabase.storage.from_("bitloss-images").upload(
-            original_path,
-            file_bytes,
-            file_options={"content-type": f"image/{file_ext}"}
-        )
+        # Bounded-size copy that is served at 100% and that every decay frame is rendered from
+        try:
+            working_bytes = await asyncio.to_thread(decay.make_working_copy, spool.name)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Unsupported image")
+
+        # A secret is hidden in the pixels of a carrier made from the working copy, once the
+        # post is live (stego.hide). Only whether it fits is checked here, from the header.
+        if secret and not stego.fits(working_bytes, secret):
+            raise HTTPException(status_code=400, detail="Secret too long for this image")
+
+        metrics.storage_bytes.inc(os.path.getsize(spool.name) + len(working_bytes), direction="out")
+
+        # Both copies go up at the same time; the original streams from disk
+        bucket = adb.supabase.storage.from_("bitloss-images")
+        with open(spool.name, "rb") as original:
+            await asyncio.gather(
+                bucket.upload(original_path, original, file_options={"content-type": f"image/{file_ext}"}),
+                bucket.upload(working_path, working_bytes, file_options={"content-type": "image/jpeg"})
+            )
 
         image_payload = {
             "uploader_id": author_id, 
             "username": author_username,
-            "storage_path": active_path, 
+            "storage_path": working_path,
             "original_storage_path": original_path,
             "bit_integrity": 100.0,
             "current_quality": 100.0,
@@ -191,242 +287,188 @@ async def upload_image(
             "last_viewed": datetime.utcnow().isoformat()
         }
         
-        safe_db_execute(db.supabase.table("images").insert(image_payload))
-        
-        new_post_res = db.supabase.table("images").select("id").eq("storage_path", active_path).execute()
+        # The insert returns the new row, so no second query is needed for its id
+        new_post_res = await adb.execute(adb.supabase.table("images").insert(image_payload))
         new_image_id = new_post_res.data[0]['id']
 
         if secret:
             secret_payload = {
                 "image_id": new_image_id, 
-                "secret_text": secret
+                "secret_text": secret,
+                "embedded": False
             }
-            safe_db_execute(db.supabase.table("image_secrets").insert(secret_payload))
+            await adb.execute(adb.supabase.table("image_secrets").insert(secret_payload))
+            # GhostTag in stego.py's workers, under a per-post seed; the carrier is kept in the
+            # private secrets bucket, so the public original stays secret-free
+            stego.hide(new_image_id, original_path, working_bytes, secret)
+
+        fanout.publish("post", {
+            "id": new_image_id,
+            "username": author_username,
+            "avatar_url": user.get('avatar_url'),
+            "image": f"{SUPABASE_URL}/storage/v1/object/public/bitloss-images/{working_path}",
+            "bitIntegrity": 100.0,
+            "generations": 0,
+            "witnesses": 0,
+            "caption": image_payload["caption"],
+            "has_secret": image_payload["has_secret"],
+            "comments": [],
+            "comment_count": 0
+        })
 
         return {"status": "success", "id": new_image_id}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"UPLOAD ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if spool:
+            spool.close()
+            os.unlink(spool.name)
 
 @app.get("/feed")
-def get_feed(request: Request, background_tasks: BackgroundTasks):
-    if not db.supabase: return []
+async def get_feed(
+    request: Request,
+    cursor: str = Query(None),
+    limit: int = Query(FEED_DEFAULT_LIMIT, ge=1, le=FEED_MAX_LIMIT)
+):
+    page = await build_feed_page(request, cursor, limit)
+    return CompactJSONResponse(page, request)
+
+async def build_feed_page(request: Request, cursor: str = None, limit: int = FEED_DEFAULT_LIMIT) -> FeedPage:
+    """One page of the live feed (shared by /feed and the /stream snapshot)."""
+    if not adb.supabase: return FeedPage(posts=[])
+
+    after = decode_feed_cursor(cursor) if cursor else None
 
     try:
-        current_user = get_current_user(request)
+        current_user = await get_current_user(request)
         current_user_id = current_user['id'] if current_user else None
         
-        # Fetch Active Posts
-        response = safe_db_execute(
-            db.supabase.table('images')
-            .select('*')
+        # Fetch One Page of Active Posts (one extra row tells us if another page exists)
+        query = (
+            adb.supabase.table('images')
+            .select(FEED_COLUMNS)
             .eq('is_archived', False)
+        )
+        if after:
+            created_at, last_id = after
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{last_id}")'
+            )
+        response = await adb.execute(
+            query
             .order('created_at', desc=True)
+            .order('id', desc=True)
+            .limit(limit + 1)
+        )
+        posts = response.data[:limit]
+        next_cursor = encode_feed_cursor(posts[-1]) if len(response.data) > limit else None
+
+        # Bulk Lookups: one round trip each, all in flight at once, joined in memory below
+        post_ids = [row['id'] for row in posts]
+
+        # The only write is the witness counter, buffered and flushed in batches by counters.py
+        # (integrity itself is advanced by the decay engine)
+        decay_engine.note_witnesses(post_ids, current_user_id)
+        counters.record_views(post_ids)
+        comments_by_post, comment_counts = await adb.get_latest_comments(post_ids, comments.FEED_COMMENTS_PER_POST)
+        # Authors and commenters in one lookup
+        users = await adb.get_users_by_ids(
+            [row.get('uploader_id') for row in posts] + comments.commenter_ids(comments_by_post)
         )
-        posts = response.data
         
         final_response_data = []
-        db_updates = []
-        total_viewer_credits = 0
-        kills_this_session = 0 
-        
-        current_time = time.time()
-
-        for row in posts:
-            author_id = row.get('uploader_id')
-            p_author_name = row.get('username', 'Unknown')
-            p_author_av = None
-            
-            if author_id:
-                try:
-                    author_res = db.supabase.table('users').select('username, avatar_url').eq('id', author_id).maybe_single().execute()
-                    if author_res.data:
-                        p_author_name = author_res.data['username']
-                        p_author_av = author_res.data['avatar_url']
-                except: pass
-
-            # Decay Logic
-            try:
-                last_update_str = row.get('last_viewed')
-                last_update = datetime.fromisoformat(last_update_str.replace('Z', '+00:00')).timestamp() if last_update_str else current_time
-            except:
-                last_update = current_time
-
-            time_diff = current_time - last_update
-            decay_rate = (0.05 / 3600.0) * (1 + (row.get('witnesses', 0) / 50)) * (1 + (row.get('generations', 0) / 20))
-            decay_amount = decay_rate * time_diff
-
-            old_integrity = row.get('bit_integrity', 100.0)
-            new_integrity = old_integrity
-            is_destroyed_now = row.get('is_destroyed', False)
-            
-            # --- GENERATION LOGIC ---
-            # We increment generation every time the feed processes this image, 
-            # representing a "time step" or "view cycle".
-            current_gens = row.get('generations', 0) or 0
-            new_gens = current_gens + 1 
-
-            if not is_destroyed_now:
-                new_integrity = max(0.0, old_integrity - decay_amount)
-                
-                if current_user_id:
-                    credit_diff = int(old_integrity) - int(new_integrity)
-                    if credit_diff > 0:
-                        total_viewer_credits += credit_diff
-
-                if new_integrity <= 0 and old_integrity > 0:
-                    is_destroyed_now = True 
-                    if author_id:
-                        try:
-                            a_data = db.supabase.table('users').select('credits').eq('id', author_id).single().execute()
-                            current_a_creds = a_data.data.get('credits', 0) if a_data.data else 0
-                            db.supabase.table('users').update({'credits': current_a_creds + 100}).eq('id', author_id).execute()
-                        except: pass
-
-                    if current_user_id:
-                        if author_id and current_user_id != author_id:
-                            total_viewer_credits += 100 
-                            kills_this_session += 1 
-
-                row.update({
-                    "bit_integrity": new_integrity,
-                    "current_quality": new_integrity, 
-                    "last_viewed": datetime.utcnow().isoformat(),
-                    "witnesses": (row.get('witnesses', 0) or 0) + 1,
-                    "generations": new_gens, 
-                    "is_destroyed": is_destroyed_now,
-                    "is_archived": is_destroyed_now
-                })
-                
-                db_updates.append({
-                    "id": row['id'],
-                    "bit_integrity": new_integrity,
-                    "current_quality": new_integrity,
-                    "last_viewed": row['last_viewed'],
-                    "witnesses": row['witnesses'],
-                    "generations": new_gens, 
-                    "is_destroyed": row['is_destroyed'],
-                    "is_archived": row['is_archived']
-                })
-
-                if new_integrity < 100 and row.get("storage_path"):
-                     background_tasks.add_task(process_remote_decay, row["storage_path"], new_integrity)
-
-            # Comments
-            c_res = safe_db_execute(
-                db.supabase.table('comments').select('*').eq('post_id', row['id']).order('created_at')
-            )
-            final_comments = []
-            for c in c_res.data:
-                comment_username = c.get('username', 'Anonymous')
-                comment_avatar = None
-                try:
-                    u_res = db.supabase.table('users').select('avatar_url').eq('username', comment_username).maybe_single().execute()
-                    if u_res.data:
-                        comment_avatar = u_res.data['avatar_url']
-                except: pass
-
-                final_comments.append({
-                    "id": str(c['id']),
-                    "username": comment_username, 
-                    "avatar_url": comment_avatar,
-                    "content": c['content'],
-                    "created_at": c['created_at']
-                })
-
-            has_secret = False
-            try:
-                s_chk = db.supabase.table('image_secrets').select('image_id').eq('image_id', row['id']).maybe_single().execute()
-                if s_chk.data: has_secret = True
-            except: pass
+        integrities = decay_engine.project_integrity(posts)
+
+        for row, integrity in zip(posts, integrities):
+            author = users.get(row.get('uploader_id'))
+            p_author_name = author['username'] if author else row.get('username', 'Unknown')
+            p_author_av = author.get('avatar_url') if author else None
 
             s_path = row.get('storage_path')
             img_url = f"{SUPABASE_URL}/storage/v1/object/public/bitloss-images/{s_path}" if s_path else ""
 
-            final_response_data.append({
-                "id": row['id'],
-                "username": p_author_name,
-                "avatar_url": p_author_av,
-                "image": img_url,
-                "bitIntegrity": row.get('bit_integrity', 100.0),
-                "generations": new_gens, 
-                "witnesses": row.get('witnesses', 0),
-                "caption": row.get("caption", ""),
-                "has_secret": has_secret,
-                "comments": final_comments
-            })
-
-        if db_updates:
-            safe_db_execute(db.supabase.table('images').upsert(db_updates))
-
-        if current_user_id and (total_viewer_credits > 0 or kills_this_session > 0):
-            u_data = db.supabase.table('users').select('credits, kills').eq('id', current_user_id).single().execute()
-            if u_data.data:
-                exist_creds = u_data.data.get('credits', 0) or 0
-                exist_kills = u_data.data.get('kills', 0) or 0
-                
-                safe_db_execute(db.supabase.table('users').update({
-                    'credits': exist_creds + total_viewer_credits,
-                    'kills': exist_kills + kills_this_session
-                }).eq('id', current_user_id))
-
-        return final_response_data
+            generations = counters.merged(row, 'generations')
+            trending.update(row['id'], p_author_name, generations, integrity)
+
+            final_response_data.append(FeedPost(
+                id=row['id'],
+                username=p_author_name,
+                avatar_url=p_author_av,
+                image=img_url,
+                bitIntegrity=integrity,
+                generations=generations,
+                witnesses=counters.merged(row, 'witnesses'),
+                caption=row.get("caption", ""),
+                has_secret=bool(row.get('has_secret')),
+                comments=comments.feed_comments(comments_by_post.get(row['id'], []), users),
+                comment_count=comment_counts.get(row['id'], 0)
+            ))
+
+        return FeedPage(posts=final_response_data, next_cursor=next_cursor)
 
     except Exception as e:
         print(f"Feed System Error: {e}")
-        return []
+        return FeedPage(posts=[])
+
+@app.get("/stream")
+async def stream_feed(request: Request):
+    """
+    Server-Sent Events: one 'snapshot' (the first feed page), then only deltas:
+    'integrity' (list of {id, bitIntegrity[, image]}), 'death' (list of ids),
+    'post' (a new feed item), 'comment' ({post_id, comment}) and 'archive' ({id}).
+    """
+    # Subscribe before taking the snapshot so nothing published in between is missed
+    queue = broadcast.subscribe()
+    snapshot = await build_feed_page(request)
+    return StreamingResponse(
+        broadcast.stream(request, queue, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/interact")
-def interact_with_post(request: Request, body: InteractRequest):
+async def interact_with_post(request: Request, body: InteractRequest):
     try:
-        user = get_current_user(request)
+        user = await get_current_user(request)
         if not user:
             raise HTTPException(status_code=401, detail="Login required")
 
         user_id = user['id']
         COST = 10
 
-        if not db.supabase:
+        if not adb.supabase:
             raise HTTPException(status_code=503, detail="DB Disconnected")
 
-        u_data = safe_db_execute(db.supabase.table('users').select('credits').eq('id', user_id).single())
-        current_creds = u_data.data.get('credits', 0)
-        
-        if current_creds < COST:
-             raise HTTPException(status_code=402, detail="Insufficient Credits")
-        
-        safe_db_execute(db.supabase.table('users').update({'credits': current_creds - COST}).eq('id', user_id))
+        if body.action not in ("heal", "corrupt"):
+            raise HTTPException(status_code=400, detail="Invalid action")
 
-        post_res = safe_db_execute(db.supabase.table("images").select("*").eq("id", body.post_id))
-        if not post_res.data:
+        # Funds check, charge, integrity change and generation bump happen in one transaction
+        result = await adb.apply_interaction(user_id, body.post_id, body.action, COST)
+        status = result.get("status")
+        if status == "insufficient_funds":
+            raise HTTPException(status_code=402, detail="Insufficient Credits")
+        if status == "not_found":
             raise HTTPException(status_code=404, detail="Post not found")
-        
-        post = post_res.data[0]
-        current_integrity = post.get("bit_integrity", 100.0)
-        
-        # --- FETCH & INCREMENT GENERATION ---
-        current_gens = post.get("generations", 0) or 0
-        new_gens = current_gens + 1
-
-        if body.action == "heal":
-            new_integrity = min(100.0, current_integrity + 5.0)
-        elif body.action == "corrupt":
-            new_integrity = max(0.0, current_integrity - 5.0)
-        else:
+        if status != "success":
             raise HTTPException(status_code=400, detail="Invalid action")
-
-        safe_db_execute(db.supabase.table("images").update({
-            "bit_integrity": new_integrity,
-            "current_quality": new_integrity,
-            "generations": new_gens, 
-            "last_viewed": datetime.utcnow().isoformat()
-        }).eq("id", body.post_id))
+        # Every worker's caches and streams hear about it, not just this one's (fanout.py)
+        fanout.invalidate_users([user_id])
+        fanout.publish("integrity", [{"id": body.post_id, "bitIntegrity": result["new_integrity"]}])
+        fanout.bump_trending(body.post_id, 1, integrity=result["new_integrity"])
+        if body.action == "heal":
+            fanout.forget_reveal(body.post_id)
+        if result.get("destroyed"):
+            fanout.publish("death", [body.post_id])
+            cleanup.report_deaths([body.post_id])
 
         return {
             "status": "success",
-            "new_integrity": new_integrity,
-            "remaining_credits": current_creds - COST,
+            "new_integrity": result["new_integrity"],
+            "remaining_credits": result["remaining_credits"],
             "action": body.action
         }
     except HTTPException as he:
@@ -436,13 +478,13 @@ def interact_with_post(request: Request, body: InteractRequest):
         raise HTTPException(status_code=500, detail="Interaction failed due to server error")
 
 @app.post("/comment")
-def post_comment(request: Request, body: dict):
-    user = get_current_user(request)
+async def post_comment(request: Request, body: dict):
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
     
     try:
-        post_data = safe_db_execute(db.supabase.table("images").select("current_quality").eq("id", body['post_id']))
+        post_data = await adb.execute(adb.supabase.table("images").select("current_quality").eq("id", body['post_id']))
         current_integrity = 100.0
         if post_data.data:
             current_integrity = post_data.data[0].get('current_quality', 100.0)
@@ -455,78 +497,100 @@ def post_comment(request: Request, body: dict):
             "username": user['username'], 
             "content": body['content'],
             "integrity_snapshot": current_integrity, 
-            "parent_id": parent_id
+            "parent_id": parent_id,
+            "user_id": user['id']
         }
         
-        safe_db_execute(db.supabase.table("comments").insert(comment_payload))
+        res = await adb.execute(adb.supabase.table("comments").insert(comment_payload))
+        if res.data:
+            saved = res.data[0]
+            fanout.publish("comment", {
+                "post_id": body['post_id'],
+                "comment": {
+                    "id": str(saved['id']),
+                    "username": user['username'],
+                    "avatar_url": user.get('avatar_url'),
+                    "content": saved['content'],
+                    "created_at": saved['created_at'],
+                    "parent_id": str(parent_id) if parent_id else None
+                }
+            })
         
         return {"status": "Comment recorded"}
     except Exception as e:
         print(f"Comment Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to save comment")
 
+@app.get("/posts/{post_id}/comments")
+async def get_post_comments(
+    request: Request,
+    post_id: str,
+    cursor: str = None,
+    limit: int = Query(comments.THREAD_PAGE_DEFAULT, ge=1, le=comments.THREAD_PAGE_MAX)
+):
+    """A post's full discussion, oldest first, threaded, one page at a time."""
+    after = decode_feed_cursor(cursor) if cursor else None
+    try:
+        page, last = await comments.thread_page(post_id, after, limit)
+    except Exception as e:
+        print(f"Comments Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load comments")
+    page.next_cursor = encode_feed_cursor(last) if last else None
+    return CompactJSONResponse(page, request)
+
 # ... (Graveyard, Archive, Trending, Reveal routes) ...
 
+# Same answer for every caller, so these are served from the shared response cache (cache.py)
+ARCHIVE_MAX_ITEMS = 500   # /archive used to return every archived row
+
 @app.get("/graveyard")
-def get_graveyard():
-    if not db.supabase: return [] 
-    response = safe_db_execute(db.supabase.table("images").select("*").eq("is_archived", True).order("created_at", desc=True).limit(4))
-    res = response.data
-    results = []
-    for post in res:
-        final_path = post.get("original_storage_path") or post.get("storage_path")
-        results.append({
-            "id": post["id"],
-            "username": post.get("username", "Unknown"),
-            "storage_path": final_path,
-            "image": f"{SUPABASE_URL}/storage/v1/object/public/bitloss-images/{final_path}"
-        })
-    return results
+async def get_graveyard(request: Request):
+    async def load():
+        if not adb.supabase: return []
+        response = await adb.execute(adb.supabase.table("images").select(GRAVEYARD_COLUMNS).eq("is_archived", True).order("created_at", desc=True).limit(4))
+        results = []
+        for post in response.data:
+            final_path = post.get("original_storage_path") or post.get("storage_path")
+            results.append(GraveyardItem(
+                id=post["id"],
+                username=post.get("username", "Unknown"),
+                storage_path=final_path,
+                image=f"{SUPABASE_URL}/storage/v1/object/public/bitloss-images/{final_path}"
+            ))
+        return results
+    return await cache.serve(request, "graveyard", load)
 
 @app.get("/archive")
-def get_archive():
-    if not db.supabase: return []
-    response = safe_db_execute(db.supabase.table("images").select("*").eq("is_archived", True).order("created_at", desc=True))
-    res = response.data
-    results = []
-    for post in res:
-        final_path = post.get("original_storage_path") or post.get("storage_path")
-        results.append({
-            "id": post["id"],
-            "username": post.get("username", "Unknown"),
-            "generations": post.get("generations", 0),
-            "storage_path": final_path,
-            "image": f"{SUPABASE_URL}/storage/v1/object/public/bitloss-images/{final_path}"
-        })
-    return results
+async def get_archive(request: Request):
+    async def load():
+        if not adb.supabase: return []
+        response = await adb.execute(adb.supabase.table("images").select(ARCHIVE_COLUMNS).eq("is_archived", True).order("created_at", desc=True).limit(ARCHIVE_MAX_ITEMS))
+        results = []
+        for post in response.data:
+            final_path = post.get("original_storage_path") or post.get("storage_path")
+            results.append(ArchiveItem(
+                id=post["id"],
+                username=post.get("username", "Unknown"),
+                generations=post.get("generations", 0),
+                storage_path=final_path,
+                image=f"{SUPABASE_URL}/storage/v1/object/public/bitloss-images/{final_path}"
+            ))
+        return results
+    return await cache.serve(request, "archive", load)
 
 @app.get("/trending")
-def get_trending():
-    if not db.supabase: return []
-    response = safe_db_execute(db.supabase.table("images").select("*").eq("is_archived", False).order("generations", desc=True).limit(5))
-    res = response.data
-    results = []
-    for post in res:
-        results.append({
-            "id": post["id"],
-            "username": post.get("username", "Unknown"),
-            "generations": post.get("generations", 0),
-            "bitIntegrity": post.get("current_quality", 100),
-            "decay_rate": f"{min(99, int((post.get('generations') or 0) * 0.1))}%/view"
-        })
-    return results
+async def get_trending(request: Request):
+    # Served from the in-memory index (trending.py), kept current by /feed, /interact and the decay tick
+    return CompactJSONResponse(trending.top(), request)
+
+@app.get("/trending/hot")
+async def get_hot(request: Request):
+    """Posts gaining generations fastest over the last hour."""
+    return CompactJSONResponse(trending.hot(), request)
 
 @app.get("/reveal/{post_id}")
-def reveal_secret(post_id: str):
-    if not db.supabase: return {"status": "error", "message": "DB_DISCONNECTED"}
+async def reveal_secret(post_id: str):
+    # Integrity gate and secret in one RPC; "too low" answers are briefly cached (reveal.py)
     try:
-        query = db.supabase.table("images").select("current_quality").eq("id", post_id)
-        image_data = safe_db_execute(query)
-        if not image_data.data: return {"status": "error", "message": "IMAGE_ID_NOT_FOUND"}
-        if image_data.data[0].get('current_quality', 100.0) < 80.0: return {"status": "dead", "message": "INTEGRITY_TOO_LOW"}
-        
-        secret_query = db.supabase.table("image_secrets").select("secret_text").eq("image_id", post_id)
-        response = safe_db_execute(secret_query)
-        if response.data: return {"status": "success", "message": response.data[0]['secret_text']}
-        return {"status": "dead", "message": "SECRET_NOT_FOUND_IN_DB"}
+        return await reveal.reveal(post_id)
     except Exception as e: return {"status": "error", "message": str(e)}
\ No newline at end of file
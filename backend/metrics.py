@@ -0,0 +1,151 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+# --- CONFIG ---
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+UNTRACKED_PATHS = {"/metrics", "/stream"}  # Scrapes and long-lived streams would skew latency
+
+# Round trips made while serving the current request (set by the middleware)
+_request_queries: ContextVar = ContextVar("request_queries", default=None)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # {labels: [bucket counts..., sum, count]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(key)} {series[-1]}")
+        return lines
+
+
+def gauge_lines(name, help_text, samples, metric_type="gauge"):
+    """
+    Renders values read at scrape time. `samples` is [(labels dict, value)].
+    Running totals kept elsewhere (e.g. cache hit counts) pass metric_type="counter".
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_label_text(tuple(sorted(labels.items())))} {value}")
+    return lines
+
+
+# --- METRICS ---
+http_latency = Histogram("bitrot_http_request_duration_seconds", "Request latency by route.")
+db_queries_per_request = Histogram("bitrot_db_queries_per_request", "Supabase round trips made by one request.", COUNT_BUCKETS)
+db_query_latency = Histogram("bitrot_db_query_duration_seconds", "Latency of one Supabase round trip.")
+db_retries = Counter("bitrot_db_retries_total", "Supabase round trips retried after a connection error.")
+storage_bytes = Counter("bitrot_storage_bytes_total", "Bytes moved to and from Supabase Storage.")
+decay_job_latency = Histogram("bitrot_decay_job_duration_seconds", "Time to produce one decay frame.")
+decay_tick_latency = Histogram("bitrot_decay_tick_duration_seconds", "Time for one decay engine tick.", LATENCY_BUCKETS + (30.0, 60.0))
+reaper_batch_latency = Histogram("bitrot_reaper_batch_duration_seconds", "Reaper time per batch, by step.")
+
+_collectors = [http_latency, db_queries_per_request, db_query_latency, db_retries,
+               storage_bytes, decay_job_latency, decay_tick_latency, reaper_batch_latency]
+_gauge_sources = []  # Functions returning gauge lines, read at scrape time
+
+
+def register_gauges(source):
+    """Adds a function called on every scrape that returns rendered gauge lines."""
+    _gauge_sources.append(source)
+    return source
+
+
+def observe_query(seconds, client="async"):
+    """Called by the DB wrappers for every round trip."""
+    db_query_latency.observe(seconds, client=client)
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def render():
+    lines = []
+    for collector in _collectors:
+        lines.extend(collector.render())
+    for source in _gauge_sources:
+        try:
+            lines.extend(source())
+        except Exception as e:
+            print(f"METRICS ERROR: {e}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (does not buffer streaming responses) timing every request."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTRACKED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            # Route templates ("/reveal/{post_id}") keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_latency.observe(time.perf_counter() - start, route=route, method=scope["method"], status=status["code"])
+            db_queries_per_request.observe(queries[0], route=route)
@@ -0,0 +1,55 @@
+import gzip
+
+import orjson
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # Optional: without it clients get gzip
+    brotli = None
+
+# --- CONFIG ---
+COMPRESS_MIN_BYTES = 1024   # Below this the headers cost more than compression saves
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5          # Fast enough to run per request
+
+
+def dumps(data) -> bytes:
+    """orjson encoding; dataclass records, datetimes and numpy floats need no conversion."""
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY, default=str)
+
+
+def choose_encoding(request: Request):
+    """Picks the best encoding the client accepts, or None."""
+    accepted = request.headers.get("accept-encoding", "")
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+class CompactJSONResponse(Response):
+    """
+    JSON through orjson. Given the request, the body is also compressed with
+    the best encoding the client accepts, once it is big enough to be worth it.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content, request: Request = None, status_code: int = 200, headers=None, **kwargs):
+        body = content if isinstance(content, bytes) else dumps(content)
+        headers = dict(headers or {})
+        encoding = choose_encoding(request) if request is not None else None
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Vary"] = "Accept-Encoding"
+        super().__init__(body, status_code=status_code, headers=headers, **kwargs)
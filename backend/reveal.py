@@ -0,0 +1,49 @@
+import database_async as adb
+import decay
+import stego
+from utils import TTLCache
+
+# --- CONFIG ---
+MIN_INTEGRITY = stego.MIN_READABLE_INTEGRITY   # Below this the secret has rotted away
+TOO_LOW_TTL_SECONDS = 15    # How long a "too low" answer is reused
+
+# --- STATE ---
+# Posts recently found below MIN_INTEGRITY. Integrity mostly only falls, so
+# repeated decipher attempts on a dying post are answered without a query;
+# a heal (the one way back up) drops the entry early via forget().
+_too_low = TTLCache(10_000, TOO_LOW_TTL_SECONDS)
+
+TOO_LOW = {"status": "dead", "message": "INTEGRITY_TOO_LOW"}
+
+
+async def reveal(post_id):
+    """The /reveal answer for a post: its secret, or why it cannot be read."""
+    if _too_low.get(post_id):
+        return TOO_LOW
+    if not adb.supabase: return {"status": "error", "message": "DB_DISCONNECTED"}
+
+    result = await adb.reveal_secret(post_id, MIN_INTEGRITY)
+    status = result.get("status")
+    if status == "success":
+        if not result.get("embedded"):
+            # Uploaded before secrets were hidden in the pixels, or still being hidden (stego.hide)
+            return {"status": "success", "message": result["secret_text"]}
+        # Read from the pixels, rotted to the post's current bucket: the secret decays with the image
+        ok, message = await stego.extract(
+            post_id, result["carrier_path"], result["stego_seed"], result["stego_redundancy"],
+            decay.integrity_bucket(result["integrity"])
+        )
+        if ok:
+            return {"status": "success", "message": message}
+        return {"status": "dead", "message": "SECRET_CORRUPTED"}
+    if status == "too_low":
+        _too_low.set(post_id, True)
+        return TOO_LOW
+    if status == "no_secret":
+        return {"status": "dead", "message": "SECRET_NOT_FOUND_IN_DB"}
+    return {"status": "error", "message": "IMAGE_ID_NOT_FOUND"}
+
+
+def forget(post_id):
+    """Called after a heal, which may lift a post back above MIN_INTEGRITY."""
+    _too_low.pop(post_id)
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# --- COLUMN PROJECTIONS ---
+# Each query asks only for the columns its endpoint reads.
+FEED_COLUMNS = "id, uploader_id, username, storage_path, caption, bit_integrity, generations, witnesses, last_viewed, is_destroyed, has_secret, created_at"
+COMMENT_COLUMNS = "id, post_id, user_id, username, content, created_at, parent_id"
+GRAVEYARD_COLUMNS = "id, username, storage_path, original_storage_path"
+ARCHIVE_COLUMNS = "id, username, generations, storage_path, original_storage_path"
+TRENDING_COLUMNS = "id, username, generations, current_quality"
+REAPER_COLUMNS = "id, storage_path, original_storage_path, has_secret"
+DECAY_COLUMNS = "id, witnesses, generations, last_viewed"
+
+
+# --- RESPONSE RECORDS ---
+# Slotted dataclasses: no per-instance __dict__, and orjson serializes them natively.
+
+@dataclass(slots=True)
+class FeedComment:
+    id: str
+    username: str
+    avatar_url: Optional[str]
+    content: str
+    created_at: str
+    parent_id: Optional[str] = None
+
+
+@dataclass(slots=True)
+class CommentNode:
+    """A comment with its replies nested under it (/posts/{id}/comments)."""
+    id: str
+    username: str
+    avatar_url: Optional[str]
+    content: str
+    created_at: str
+    parent_id: Optional[str] = None
+    replies: List["CommentNode"] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class CommentPage:
+    comments: List[CommentNode]
+    next_cursor: Optional[str] = None
+
+
+@dataclass(slots=True)
+class FeedPost:
+    id: str
+    username: str
+    avatar_url: Optional[str]
+    image: str
+    bitIntegrity: float
+    generations: int
+    witnesses: int
+    caption: str
+    has_secret: bool
+    comments: List[FeedComment] = field(default_factory=list)  # The latest few only
+    comment_count: int = 0
+
+
+@dataclass(slots=True)
+class FeedPage:
+    posts: List[FeedPost]
+    next_cursor: Optional[str] = None
+
+
+@dataclass(slots=True)
+class GraveyardItem:
+    id: str
+    username: str
+    storage_path: str
+    image: str
+
+
+@dataclass(slots=True)
+class ArchiveItem:
+    id: str
+    username: str
+    generations: int
+    storage_path: str
+    image: str
+
+
+@dataclass(slots=True)
+class TrendingItem:
+    id: str
+    username: str
+    generations: int
+    bitIntegrity: float
+    decay_rate: str
+
+
+@dataclass(slots=True)
+class HotItem:
+    id: str
+    username: str
+    generations: int
+    bitIntegrity: float
+    per_hour: float
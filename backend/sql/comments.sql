@@ -0,0 +1,47 @@
+-- Comments service support (run once in the Supabase SQL editor).
+-- Assumes images.id, comments.id and users.id are uuids; change the types if yours differ.
+
+-- Commenters are linked by id so avatars come from the same batched users
+-- lookup as post authors. Older rows are backfilled from their username.
+alter table comments add column if not exists user_id uuid references users(id);
+
+update comments c
+   set user_id = u.id
+  from users u
+ where c.user_id is null
+   and u.username = c.username;
+
+-- Serves both the feed's "latest N" and /posts/{id}/comments keyset pages
+-- without sorting a post's whole comment history.
+create index if not exists comments_post_created_idx
+    on comments (post_id, created_at, id);
+
+-- The feed's comment preview: the newest `per_post` comments of every post,
+-- each row carrying its post's total comment count. Posts without comments
+-- return no rows.
+create or replace function latest_comments(post_ids uuid[], per_post integer)
+returns table (
+  id uuid,
+  post_id uuid,
+  user_id uuid,
+  username text,
+  content text,
+  created_at timestamptz,
+  parent_id uuid,
+  total bigint
+)
+language sql
+stable
+as $$
+  select c.id, c.post_id, c.user_id, c.username, c.content, c.created_at, c.parent_id, n.total
+    from unnest(post_ids) as p(post_id)
+    cross join lateral (
+      select count(*) as total from comments where comments.post_id = p.post_id
+    ) n
+    cross join lateral (
+      select * from comments
+       where comments.post_id = p.post_id
+       order by comments.created_at desc, comments.id desc
+       limit per_post
+    ) c;
+$$;
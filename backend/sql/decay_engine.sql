@@ -0,0 +1,102 @@
+-- Decay Engine support (run once in the Supabase SQL editor).
+-- Assumes images.id is a uuid; change the array type if your ids are bigint.
+
+-- Witness counter used by /feed (flushed in batches by counters.py).
+-- Adds each post's buffered views in place, so concurrent workers never lose
+-- each other's views and the feed never has to write integrity or timestamps.
+create or replace function add_witnesses(image_ids uuid[], amounts integer[])
+returns void
+language sql
+as $$
+  update images i
+     set witnesses   = coalesce(i.witnesses, 0) + v.amount,
+         generations = coalesce(i.generations, 0) + v.amount
+    from unnest(image_ids, amounts) as v(image_id, amount)
+   where i.id = v.image_id
+     and i.is_archived = false;
+$$;
+
+revoke execute on function add_witnesses(uuid[], integer[]) from public, anon, authenticated;
+
+-- Trending refresh (trending.py): the top live posts by generations, read from
+-- this index instead of sorting the whole table.
+create index if not exists images_live_generations_idx
+    on images (generations desc)
+ where is_archived = false;
+
+-- The decay tick (decay_engine.run_decay_tick). The tick works out what each
+-- living post lost since its last tick with the decay kernel (decay_engine.py
+-- holds the only copy of the formula); this subtracts it in place from whatever
+-- each row holds when the tick reaches it, so a heal, corrupt or kill from
+-- apply_interaction that commits mid-tick is decayed from, never overwritten.
+-- Destroyed and archived rows are not touched; p_tick_at is the moment the
+-- losses were computed for. Returns every row it advanced with the integrity
+-- before and after.
+drop function if exists advance_decay(double precision);
+
+create or replace function advance_decay(image_ids uuid[], losses double precision[], p_tick_at timestamptz)
+returns table (
+  id uuid,
+  uploader_id uuid,
+  username text,
+  storage_path text,
+  original_storage_path text,
+  generations integer,
+  old_integrity double precision,
+  new_integrity double precision,
+  died boolean
+)
+language sql
+as $$
+  with living as (
+    select i.id, coalesce(i.bit_integrity, 100.0) as integrity, v.lost
+      from images i
+      join unnest(image_ids, losses) as v(image_id, lost) on v.image_id = i.id
+     where i.is_archived = false
+       and coalesce(i.is_destroyed, false) = false
+       for update of i
+  ),
+  advanced as (
+    update images i
+       set bit_integrity   = greatest(0.0, coalesce(i.bit_integrity, 100.0) - l.lost),
+           current_quality = greatest(0.0, coalesce(i.bit_integrity, 100.0) - l.lost),
+           is_destroyed    = coalesce(i.bit_integrity, 100.0) - l.lost <= 0,
+           last_viewed     = p_tick_at
+      from living l
+     where i.id = l.id
+    returning i.id, i.uploader_id, i.username, i.storage_path, i.original_storage_path,
+              i.generations, l.integrity, i.bit_integrity, i.is_destroyed
+  )
+  select * from advanced;
+$$;
+
+-- Points images at frames the render workers finished. Archived rows are
+-- skipped: the Reaper has already deleted their frames.
+create or replace function set_frame_paths(image_ids uuid[], paths text[])
+returns void
+language sql
+as $$
+  update images i
+     set storage_path = v.path
+    from unnest(image_ids, paths) as v(image_id, path)
+   where i.id = v.image_id
+     and i.is_archived = false;
+$$;
+
+-- The Reaper's archive step: points each dead image back at its original.
+-- Rows that no longer exist are simply not matched, so nothing is inserted.
+create or replace function archive_images(image_ids uuid[], paths text[])
+returns void
+language sql
+as $$
+  update images i
+     set storage_path = v.path,
+         is_archived = true,
+         witnesses = 0
+    from unnest(image_ids, paths) as v(image_id, path)
+   where i.id = v.image_id;
+$$;
+
+revoke execute on function advance_decay(uuid[], double precision[], timestamptz) from public, anon, authenticated;
+revoke execute on function set_frame_paths(uuid[], text[]) from public, anon, authenticated;
+revoke execute on function archive_images(uuid[], text[]) from public, anon, authenticated;
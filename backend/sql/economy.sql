@@ -0,0 +1,98 @@
+-- Economy functions (run once in the Supabase SQL editor).
+-- Every balance change is a single statement that checks and applies in one go,
+-- so concurrent clicks and decay ticks can never lose an update.
+-- Assumes users.id and images.id are uuids.
+-- Only the backend (service role) may call these.
+
+-- Adds `p_amount` (may be negative) to a balance.
+-- Returns the new balance, or null if the user is missing or it would drop below zero.
+create or replace function increment_credits(p_user_id uuid, p_amount integer)
+returns integer
+language sql
+as $$
+  update users
+     set credits = coalesce(credits, 0) + p_amount
+   where id = p_user_id
+     and coalesce(credits, 0) + p_amount >= 0
+  returning credits;
+$$;
+
+-- Adds to entropy_score and kills.
+create or replace function increment_score(p_user_id uuid, p_points integer, p_kills integer default 0)
+returns void
+language sql
+as $$
+  update users
+     set entropy_score = coalesce(entropy_score, 0) + p_points,
+         kills         = coalesce(kills, 0) + p_kills
+   where id = p_user_id;
+$$;
+
+-- Pays out a whole decay tick's rewards in one call (parallel arrays, one entry per user).
+create or replace function apply_rewards(p_user_ids uuid[], p_credits integer[], p_kills integer[])
+returns void
+language sql
+as $$
+  update users u
+     set credits = coalesce(u.credits, 0) + r.credits,
+         kills   = coalesce(u.kills, 0) + r.kills
+    from unnest(p_user_ids, p_credits, p_kills) as r(user_id, credits, kills)
+   where u.id = r.user_id;
+$$;
+
+-- Heal/corrupt: charges the user and moves integrity by 5 in one transaction.
+-- Returns {status, new_integrity, remaining_credits, destroyed}; status is one of
+-- 'success', 'invalid_action', 'not_found', 'insufficient_funds'.
+create or replace function apply_interaction(p_user_id uuid, p_image_id uuid, p_action text, p_cost integer default 10)
+returns json
+language plpgsql
+as $$
+declare
+  v_integrity double precision;
+  v_credits integer;
+begin
+  if p_action not in ('heal', 'corrupt') then
+    return json_build_object('status', 'invalid_action');
+  end if;
+
+  select bit_integrity into v_integrity from images where id = p_image_id for update;
+  if not found then
+    return json_build_object('status', 'not_found');
+  end if;
+
+  update users
+     set credits = credits - p_cost
+   where id = p_user_id
+     and coalesce(credits, 0) >= p_cost
+  returning credits into v_credits;
+  if v_credits is null then
+    return json_build_object('status', 'insufficient_funds');
+  end if;
+
+  v_integrity := case
+    when p_action = 'heal' then least(100.0, coalesce(v_integrity, 100.0) + 5.0)
+    else greatest(0.0, coalesce(v_integrity, 100.0) - 5.0)
+  end;
+
+  -- A corrupt that reaches zero kills the image here; the decay kernel only
+  -- catches deaths that happen while it is decaying
+  update images
+     set bit_integrity   = v_integrity,
+         current_quality = v_integrity,
+         generations     = coalesce(generations, 0) + 1,
+         is_destroyed    = coalesce(is_destroyed, false) or v_integrity <= 0
+   where id = p_image_id;
+
+  return json_build_object(
+    'status', 'success',
+    'new_integrity', v_integrity,
+    'remaining_credits', v_credits,
+    'destroyed', v_integrity <= 0
+  );
+end;
+$$;
+
+revoke execute on function increment_credits(uuid, integer) from public, anon, authenticated;
+revoke execute on function increment_score(uuid, integer, integer) from public, anon, authenticated;
+revoke execute on function apply_rewards(uuid[], integer[], integer[]) from public, anon, authenticated;
+revoke execute on function apply_interaction(uuid, uuid, text, integer) from public, anon, authenticated;
@@ -0,0 +1,71 @@
+-- Leader election for background loops (run once in the Supabase SQL editor).
+-- Every worker calls try_acquire_lease on a timer; exactly one holds each lease.
+-- A holder that stops renewing (crash, deploy, network split) loses it when it
+-- expires, and the next worker to ask takes over.
+
+create table if not exists leases (
+  name       text primary key,
+  holder     text not null,
+  expires_at timestamptz not null
+);
+
+-- Takes the lease if it is free or expired, or renews it if we already hold it.
+-- Returns true when the caller is the holder afterwards.
+create or replace function try_acquire_lease(p_name text, p_holder text, p_ttl_seconds integer)
+returns boolean
+language sql
+as $$
+  with claimed as (
+    insert into leases (name, holder, expires_at)
+    values (p_name, p_holder, now() + make_interval(secs => p_ttl_seconds))
+    on conflict (name) do update
+       set holder     = excluded.holder,
+           expires_at = excluded.expires_at
+     where leases.holder = excluded.holder
+        or leases.expires_at < now()
+    returning holder
+  )
+  select exists (select 1 from claimed);
+$$;
+
+-- Gives the lease up early (clean shutdown) so failover does not wait for expiry.
+create or replace function release_lease(p_name text, p_holder text)
+returns void
+language sql
+as $$
+  delete from leases where name = p_name and holder = p_holder;
+$$;
+
+-- Witnesses noted by workers that are not running the decay engine.
+-- The leader drains this every tick and pays the viewers (see decay_engine.py).
+create table if not exists witness_ledger (
+  image_id uuid not null,
+  user_id  uuid not null,
+  primary key (image_id, user_id)
+);
+
+create or replace function drain_witness_ledger()
+returns table (image_id uuid, user_id uuid)
+language sql
+as $$
+  delete from witness_ledger returning image_id, user_id;
+$$;
+
+revoke execute on function try_acquire_lease(text, text, integer) from public, anon, authenticated;
+revoke execute on function release_lease(text, text) from public, anon, authenticated;
+revoke execute on function drain_witness_ledger() from public, anon, authenticated;
+
+-- Changes every worker must see (fanout.py): SSE deltas, trending updates and
+-- cache invalidations. Each worker writes one row per flush and polls for rows
+-- from the others; the leader deletes rows older than a few minutes.
+create table if not exists fanout_events (
+  id         bigint generated always as identity primary key,
+  origin     text not null,
+  events     jsonb not null,
+  created_at timestamptz not null default now()
+);
+
+create index if not exists fanout_events_created_at_idx on fanout_events (created_at);
+
+-- Backend (service role) only.
+alter table fanout_events enable row level security;
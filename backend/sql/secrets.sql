@@ -0,0 +1,61 @@
+-- Secret reveal (run once in the Supabase SQL editor).
+-- Assumes images.id is a uuid. Only the backend (service role) may call this.
+
+-- The feed reads secret presence from images.has_secret; make sure rows
+-- written before the flag existed agree with image_secrets.
+update images i
+   set has_secret = true
+ where coalesce(i.has_secret, false) = false
+   and exists (select 1 from image_secrets s where s.image_id = i.id);
+
+-- Secrets uploaded since GhostTag embedding also live in the pixels of a carrier
+-- (stego.py), embedded in the background once the post is live; until then, and
+-- for older uploads, they only exist as text here. Each carrier has its own
+-- random seed, which never leaves the backend, and sits in the private
+-- bitloss-secrets bucket, never next to the public original.
+alter table image_secrets add column if not exists embedded boolean not null default false;
+alter table image_secrets add column if not exists stego_seed bigint;
+alter table image_secrets add column if not exists carrier_path text;
+-- Reed-Solomon bytes used for the carrier; rows without one used the old fixed 20.
+alter table image_secrets add column if not exists stego_redundancy integer;
+
+insert into storage.buckets (id, name, public)
+values ('bitloss-secrets', 'bitloss-secrets', false)
+on conflict (id) do update set public = false;
+
+-- Carriers embedded before per-post seeds used a shared default seed and were
+-- stored as the public original: read those secrets from the text instead, and
+-- replace their originals with clean uploads.
+update image_secrets set embedded = false where embedded and stego_seed is null;
+
+-- One round trip for /reveal: the integrity gate and the secret together.
+-- status is 'not_found', 'too_low', 'no_secret' or 'success'; the secret text
+-- only leaves the database when the image is still intact enough. Embedded
+-- secrets also return their carrier and seed, so /reveal can read them from
+-- its pixels instead.
+create or replace function reveal_secret(p_image_id uuid, p_min_integrity double precision)
+returns json
+language sql
+stable
+as $$
+  select case
+    when i.id is null then json_build_object('status', 'not_found')
+    when coalesce(i.current_quality, 100.0) < p_min_integrity
+      then json_build_object('status', 'too_low', 'integrity', i.current_quality)
+    when s.secret_text is null then json_build_object('status', 'no_secret')
+    else json_build_object(
+      'status', 'success',
+      'secret_text', s.secret_text,
+      'integrity', coalesce(i.current_quality, 100.0),
+      'embedded', s.embedded,
+      'stego_seed', s.stego_seed,
+      'stego_redundancy', coalesce(s.stego_redundancy, 20),
+      'carrier_path', s.carrier_path
+    )
+  end
+  from (select 1) as one
+  left join images i on i.id = p_image_id
+  left join image_secrets s on s.image_id = i.id;
+$$;
+
+revoke execute on function reveal_secret(uuid, double precision) from public, anon, authenticated;
@@ -0,0 +1,210 @@
+import asyncio
+import io
+import math
+import os
+import secrets
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from ghosttag import GhostTag
+from PIL import Image
+
+import cache
+import database_async as adb
+import decay
+import metrics
+import tile_decay
+from utils import TTLCache
+
+# --- CONFIG ---
+SEED_BITS = 63                      # Per-post scatter "password", kept in image_secrets: without it the bits are noise
+MIN_READABLE_INTEGRITY = 80.0       # The reveal gate; every carrier is checked at upload to read here
+# Carriers rot on their own, gentler schedule: CARRIER_ROT_RATE of the post's
+# lost integrity, so 1% of tiles at the gate. Bits are scattered one per channel
+# value, so at the post's own 80% over half the bytes would arrive damaged, and
+# GhostTag's fixed 8-byte length header (2 repairable bytes) gives out first.
+CARRIER_ROT_RATE = 0.05
+EMBED_ATTEMPTS = 4                  # Seeds tried until the carrier reads at the gate (~99.5% each)
+MIN_REDUNDANCY = 24                 # Reed-Solomon bytes; up to half this many damaged bytes are repaired...
+MAX_REDUNDANCY = 170                # ...per 255-byte block: a third of each block stays repairable
+CARRIER_MAX_SIDE = 1600             # GhostTag scatters over a Python list of every channel value,
+                                    # so secret originals are capped like working copies (~5.8M values)
+WORKER_PROCESSES = max(1, min(2, (os.cpu_count() or 2) - 1))
+RESULT_CACHE_SIZE = 4096
+RESULT_TTL_SECONDS = 3600           # Results are deterministic per (post, bucket); TTL only bounds memory
+
+# --- STATE ---
+# Single-process executors; extractions of a post always run in the same one,
+# which keeps its carrier's tile state (tile_decay.py) warm between buckets.
+_pools = []
+_results = TTLCache(RESULT_CACHE_SIZE, RESULT_TTL_SECONDS)  # {(post_id, bucket): (ok, message)}
+_in_flight = {}  # {(post_id, bucket): Future} so repeated reveals share one extraction
+_hiding = set()  # Background embeds in progress (held so they are not garbage-collected)
+
+
+# --- PIPELINE STAGES (run in worker processes) ---
+
+def _ghost(seed, redundancy):
+    return GhostTag(redundancy=redundancy, seed=seed)
+
+
+def carrier_integrity(integrity: float) -> float:
+    """The integrity a carrier is rotted to when its post is at `integrity`."""
+    return 100.0 - (100.0 - integrity) * CARRIER_ROT_RATE
+
+
+def redundancy_for(message: str) -> int:
+    """Two repair bytes per message byte: a third of the bytes can arrive damaged, far above the ~4% at the gate."""
+    return min(MAX_REDUNDANCY, max(MIN_REDUNDANCY, 2 * len(message.encode("utf-8"))))
+
+
+def _carrier_size(width, height):
+    """The size of the carrier made from a width x height source."""
+    scale = min(1.0, CARRIER_MAX_SIDE / max(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def fits(source: bytes, message: str) -> bool:
+    """
+    Whether `message` fits in a carrier made from `source`, from the image header
+    alone: GhostTag needs one channel value per bit of its 8-byte length header
+    and of the message with its Reed-Solomon bytes (per 255-byte block).
+    """
+    with Image.open(io.BytesIO(source)) as img:
+        width, height = _carrier_size(*img.size)
+    length = len(message.encode("utf-8"))
+    redundancy = redundancy_for(message)
+    protected = length + redundancy * math.ceil(length / (255 - redundancy))
+    return 8 * (8 + protected) <= width * height * 3
+
+
+def _bitmap(pixels) -> io.BytesIO:
+    """Uncompressed in-memory image for GhostTag, which opens whatever PIL can."""
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="BMP")
+    buffer.seek(0)
+    return buffer
+
+
+def embed_file(source: bytes, message: str):
+    """
+    Hides `message` in the pixels of an image under a fresh random seed, and
+    checks the carrier still reads once its post rots to MIN_READABLE_INTEGRITY
+    (damage only grows below that, so it reads at every integrity above). A seed
+    that does not is replaced, at most EMBED_ATTEMPTS times. Returns (PNG carrier
+    bytes, seed, redundancy); the carrier goes to the private secrets bucket,
+    never to public storage. Raises ValueError if no seed reads at the gate.
+    """
+    with Image.open(io.BytesIO(source)) as img:
+        img.thumbnail((CARRIER_MAX_SIDE, CARRIER_MAX_SIDE))
+        pixels = np.asarray(img.convert("RGB"))
+    redundancy = redundancy_for(message)
+    gate_bucket = decay.integrity_bucket(MIN_READABLE_INTEGRITY)
+    fd, output_path = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    try:
+        for _ in range(EMBED_ATTEMPTS):
+            seed = secrets.randbits(SEED_BITS)
+            _ghost(seed, redundancy).embed(_bitmap(pixels), message, output_path)
+            with open(output_path, "rb") as f:
+                carrier = f.read()
+            if extract_bytes(carrier, seed, redundancy, gate_bucket) == (True, message):
+                return carrier, seed, redundancy
+    finally:
+        os.unlink(output_path)
+    raise ValueError(f"Secret does not survive to {MIN_READABLE_INTEGRITY:.0f}% integrity in this image")
+
+
+def extract_bytes(carrier: bytes, seed: int, redundancy: int, bucket: int):
+    """
+    Reads the secret from a carrier as rotted for a post in `bucket`. Served frames
+    are JPEGs, which wipe every LSB, so this reads tile rot losslessly on the
+    carrier's own schedule: bits in tiles that have rotted are damaged, and once
+    the damage exceeds what Reed-Solomon can repair the secret is gone.
+    Returns (ok, message or error).
+    """
+    pixels = tile_decay.rot_pixels(carrier, carrier_integrity(decay.bucket_integrity(bucket)))
+    return _ghost(seed, redundancy).extract(_bitmap(pixels))
+
+
+# --- ASYNC API ---
+
+async def _run(key, stage, *args):
+    """
+    Runs a CPU-heavy stage in the worker `key` maps to (or a thread when the
+    workers are not started, e.g. benchmarks).
+    """
+    if not _pools:
+        return await asyncio.to_thread(stage, *args)
+    pool = _pools[zlib.crc32(str(key).encode()) % len(_pools)]
+    return await asyncio.get_running_loop().run_in_executor(pool, stage, *args)
+
+
+def hide(post_id, original_path: str, source: bytes, message: str):
+    """
+    Upload stage, in the background: the post goes live at once with its secret
+    as plain text (it is pristine, so the text is what the pixels would say),
+    while a worker embeds and verifies the carrier. Once the carrier is stored,
+    image_secrets switches the post to reading from the pixels. Check fits()
+    before accepting the upload.
+    """
+    task = asyncio.create_task(_hide(post_id, original_path, source, message))
+    _hiding.add(task)
+    task.add_done_callback(_hiding.discard)
+
+
+async def _hide(post_id, original_path, source, message):
+    path = decay.carrier_path(original_path)
+    storage = adb.supabase.storage.from_(decay.SECRETS_BUCKET_NAME)
+    try:
+        carrier, seed, redundancy = await _run(post_id, embed_file, source, message)
+        await storage.upload(path, carrier, file_options={"content-type": "image/png"})
+        metrics.storage_bytes.inc(len(carrier), direction="out")
+        res = await adb.execute(adb.supabase.table("image_secrets").update({
+            "embedded": True,
+            "stego_seed": seed,
+            "stego_redundancy": redundancy,
+            "carrier_path": path
+        }).eq("image_id", post_id))
+        if not res.data:
+            # Reaped while we worked: nothing will ever read or remove the carrier
+            await storage.remove([path])
+    except ValueError as e:
+        print(f"STEGO: secret of {post_id} stays plain text: {e}")
+    except Exception as e:
+        print(f"STEGO ERROR: could not hide the secret of {post_id}: {e}")
+
+
+async def extract(post_id, carrier_path: str, seed: int, redundancy: int, bucket: int):
+    """
+    Reveal stage: the secret as it reads from the post's carrier at `bucket`.
+    Results are cached per (post, bucket); concurrent reveals share one extraction.
+    """
+    key = (post_id, bucket)
+    cached = _results.get(key)
+    if cached is not None:
+        return cached
+
+    async def read():
+        carrier = await adb.supabase.storage.from_(decay.SECRETS_BUCKET_NAME).download(carrier_path)
+        metrics.storage_bytes.inc(len(carrier), direction="in")
+        result = tuple(await _run(post_id, extract_bytes, carrier, seed, redundancy, bucket))
+        _results.set(key, result)
+        return result
+    return await cache.single_flight(_in_flight, key, read)
+
+
+async def start():
+    global _pools
+    _pools = [ProcessPoolExecutor(max_workers=1) for _ in range(WORKER_PROCESSES)]
+
+
+async def stop():
+    global _pools
+    for task in list(_hiding):
+        task.cancel()  # Those posts keep their secret as plain text
+    for pool in _pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools = []
@@ -0,0 +1,137 @@
+import hashlib
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils import RenderCache
+
+# --- CONFIG ---
+# "full" always uses bitrot on the whole image, "tiles" always uses this module,
+# "auto" uses tiles only for sources big enough for whole-image passes to hurt.
+DECAY_MODE = os.environ.get("DECAY_MODE", "auto")
+TILE_SIZE = 64
+# Only sources too big for whole-image passes: in practice originals of posts
+# from before working copies. Tiles rot more gently than bitrot at the same
+# integrity, so 1600px working copies keep bitrot's look.
+AUTO_MIN_PIXELS = 4_000_000                  # ~2400x1700 and up
+# Decoded tile grids kept between steps, per process: every render and stego
+# worker holds its own, so the total is this times their count.
+STATE_CACHE_MAX_BYTES = int(os.environ.get("TILE_STATE_CACHE_MB", "64")) * 1024 * 1024
+
+
+class TileState:
+    """
+    Where an image's decay stands: its pixels with the first `rotted` tiles of its
+    rot order already degraded. Moving to a lower integrity only touches the tiles
+    between the old and the new count.
+    """
+    __slots__ = ("pixels", "order", "rotted")
+
+    def __init__(self, pixels, order, rotted=0):
+        self.pixels = pixels
+        self.order = order
+        self.rotted = rotted
+
+
+# TileStates keyed by the source's content hash
+_states = RenderCache(STATE_CACHE_MAX_BYTES, size=lambda state: state.pixels.nbytes)
+
+
+def should_use_tiles(source: bytes) -> bool:
+    if DECAY_MODE == "tiles":
+        return True
+    if DECAY_MODE != "auto":
+        return False
+    with Image.open(io.BytesIO(source)) as img:  # Reads the header only
+        width, height = img.size
+    return width * height >= AUTO_MIN_PIXELS
+
+
+def tile_boxes(width, height):
+    """Tile rectangles (left, top, right, bottom) in row-major order."""
+    return [
+        (x, y, min(x + TILE_SIZE, width), min(y + TILE_SIZE, height))
+        for y in range(0, height, TILE_SIZE)
+        for x in range(0, width, TILE_SIZE)
+    ]
+
+
+def rot_order(digest: str, tile_count: int):
+    """The order tiles rot in: a shuffle seeded by the content, so every render agrees."""
+    return np.random.default_rng(int(digest[:16], 16)).permutation(tile_count)
+
+
+def rotted_tiles(integrity: float, tile_count: int) -> int:
+    """How many tiles are degraded at an integrity (0-100)."""
+    return int(round((1.0 - max(0.0, min(100.0, integrity)) / 100.0) * tile_count))
+
+
+def _rot_tile(pixels, box, rank, tile_count):
+    """
+    Degrades one tile in place the way bitrot degrades a whole image: resolution loss.
+    A tile's damage depends only on its own pixels and its place in the rot order,
+    so it is the same whichever step reaches it.
+    """
+    left, top, right, bottom = box
+    width, height = right - left, bottom - top
+    scale = max(0.05, 1.0 - (rank + 1) / tile_count)
+    tile = Image.fromarray(pixels[top:bottom, left:right])
+    small = tile.resize((max(1, int(width * scale)), max(1, int(height * scale))), resample=Image.LANCZOS)
+    pixels[top:bottom, left:right] = np.asarray(small.resize((width, height), resample=Image.BILINEAR))
+
+
+def _fresh_state(source: bytes, digest: str):
+    with Image.open(io.BytesIO(source)) as img:
+        pixels = np.array(img.convert("RGB"))
+    height, width = pixels.shape[:2]
+    return TileState(pixels, rot_order(digest, len(tile_boxes(width, height))))
+
+
+def _advance(source: bytes, integrity: float):
+    """
+    Takes the cached state of `source` and degrades only the tiles that rot between
+    its last step and `integrity`. The caller puts the state back when done.
+    """
+    digest = hashlib.sha256(source).hexdigest()
+    state = _states.take(digest)
+    if state is None:
+        state = _fresh_state(source, digest)
+
+    tile_count = len(state.order)
+    target = rotted_tiles(integrity, tile_count)
+    if target < state.rotted:
+        # Healed past what we have: rot cannot be undone, so start over from the source
+        state = _fresh_state(source, digest)
+
+    height, width = state.pixels.shape[:2]
+    boxes = tile_boxes(width, height)
+    for rank in range(state.rotted, target):
+        _rot_tile(state.pixels, boxes[state.order[rank]], rank, tile_count)
+    state.rotted = target
+    return digest, state
+
+
+def render(source: bytes, integrity: float) -> bytes:
+    """
+    Renders `source` at `integrity` (0-100) by degrading only the tiles that rot
+    between the last rendered step and this one. The result is a pure function of
+    (source, integrity): the same bytes as rendering it from scratch.
+    """
+    digest, state = _advance(source, integrity)
+    buffer = io.BytesIO()
+    Image.fromarray(state.pixels).save(buffer, format="JPEG", quality=int(max(5, integrity * 0.95)))
+    _states.put(digest, state)
+    return buffer.getvalue()
+
+
+def rot_pixels(source: bytes, integrity: float):
+    """
+    The pixels of `source` at `integrity`, before any lossy encoding: tiles that have
+    not rotted yet are bit-for-bit the source's (stego.py reads hidden data from them).
+    """
+    digest, state = _advance(source, integrity)
+    pixels = state.pixels.copy()
+    _states.put(digest, state)
+    return pixels
@@ -0,0 +1,216 @@
+import asyncio
+import heapq
+import threading
+import time
+from collections import deque
+
+import database_async as adb
+from schemas import TRENDING_COLUMNS, HotItem, TrendingItem
+from utils import TTLCache
+
+# --- CONFIG ---
+TOP_K = 5
+SEED_SIZE = 200              # Posts loaded from the database on each refresh
+REFRESH_SECONDS = 60         # Rebuilds the index from the database (drops archived posts)
+TOMBSTONE_SECONDS = 2 * REFRESH_SECONDS  # Removed posts ignore late updates until refreshes agree
+HOT_WINDOW_SECONDS = 3600    # "Hot" counts generations gained in this window...
+HOT_BUCKET_SECONDS = 60      # ...kept in buckets of this width, expired whole
+
+# --- STATE ---
+# Every post this worker has heard of since the last refresh, its ready-to-serve
+# item, and the current top K by generations. Generations only grow, so a post
+# can only enter the top K when it is updated, and only by beating the K-th
+# entry: updates cost O(K).
+_lock = threading.Lock()
+_items = {}         # {post_id: TrendingItem}
+_top = []           # TrendingItems, most generations first
+_buckets = deque()  # [(bucket_start, {post_id: generations gained})], oldest first
+_window = {}        # {post_id: generations gained inside the window}
+# Posts archived recently. A tick or /feed read that started before the archive
+# must not put them back, so updates for them are ignored for a while.
+_removed = TTLCache(50_000, TOMBSTONE_SECONDS)
+
+
+def _make_item(post_id, username, generations, integrity):
+    return TrendingItem(
+        id=post_id,
+        username=username or "Unknown",
+        generations=generations,
+        bitIntegrity=integrity,
+        decay_rate=f"{min(99, int(generations * 0.1))}%/view"
+    )
+
+
+def _place(item):
+    """Keeps _top in step with one changed item (caller holds _lock)."""
+    for i, current in enumerate(_top):
+        if current.id == item.id:
+            _top[i] = item
+            break
+    else:
+        if len(_top) >= TOP_K and item.generations <= _top[-1].generations:
+            return
+        _top.append(item)
+    _top.sort(key=lambda entry: entry.generations, reverse=True)
+    del _top[TOP_K:]
+
+
+def _expire(now):
+    """Drops buckets that left the hot window (caller holds _lock)."""
+    while _buckets and _buckets[0][0] <= now - HOT_WINDOW_SECONDS:
+        _, gains = _buckets.popleft()
+        for post_id, gained in gains.items():
+            remaining = _window.get(post_id, 0) - gained
+            if remaining > 0:
+                _window[post_id] = remaining
+            else:
+                _window.pop(post_id, None)
+
+
+def _record_gain(post_id, gained, now):
+    """Adds generations to the current hot bucket (caller holds _lock)."""
+    start = now - now % HOT_BUCKET_SECONDS
+    if not _buckets or _buckets[-1][0] != start:
+        _buckets.append((start, {}))
+    gains = _buckets[-1][1]
+    gains[post_id] = gains.get(post_id, 0) + gained
+    _window[post_id] = _window.get(post_id, 0) + gained
+
+
+def update(post_id, username=None, generations=None, integrity=None):
+    """
+    Records a post's latest known values. Any missing value keeps what the index had.
+    A lower generations count than the index holds is a stale read and is ignored;
+    a higher one counts towards the hot score.
+    """
+    now = time.time()
+    with _lock:
+        if _removed.get(post_id):
+            return
+        previous = _items.get(post_id)
+        if previous is None and generations is None:
+            return
+        if previous is not None:
+            username = username or previous.username
+            integrity = previous.bitIntegrity if integrity is None else integrity
+            generations = max(previous.generations, generations or 0)
+            gained = generations - previous.generations
+            if gained == 0 and integrity == previous.bitIntegrity and username == previous.username:
+                return
+        else:
+            gained = 0
+
+        item = _make_item(post_id, username, generations, 100.0 if integrity is None else integrity)
+        _items[post_id] = item
+        _place(item)
+        if gained > 0:
+            _expire(now)
+            _record_gain(post_id, gained, now)
+
+
+def bump(post_id, gained=1, integrity=None):
+    """Adds generations to a post the index already knows (e.g. after an interaction)."""
+    with _lock:
+        previous = _items.get(post_id)
+    if previous is not None:
+        update(post_id, generations=previous.generations + gained, integrity=integrity)
+
+
+def remove(post_ids):
+    """Forgets archived posts, refilling the top K from the rest if one of them was in it."""
+    global _top
+    with _lock:
+        for post_id in post_ids:
+            _removed.set(post_id, True)
+            _items.pop(post_id, None)
+            _window.pop(post_id, None)
+        if any(item.id in post_ids for item in _top):
+            _top = heapq.nlargest(TOP_K, _items.values(), key=lambda item: item.generations)
+
+
+def top():
+    """The K posts with the most generations, best first. O(K)."""
+    with _lock:
+        return list(_top)
+
+
+def hot():
+    """
+    The K posts that gained the most generations per hour over the last
+    HOT_WINDOW_SECONDS. Only posts active inside the window are considered.
+    """
+    hours = HOT_WINDOW_SECONDS / 3600
+    with _lock:
+        _expire(time.time())
+        leaders = heapq.nlargest(TOP_K, _window.items(), key=lambda entry: entry[1])
+        results = []
+        for post_id, gained in leaders:
+            item = _items.get(post_id)
+            if item is not None:
+                results.append(HotItem(
+                    id=item.id,
+                    username=item.username,
+                    generations=item.generations,
+                    bitIntegrity=item.bitIntegrity,
+                    per_hour=round(gained / hours, 2)
+                ))
+        return results
+
+
+def _rebuild(rows):
+    """
+    Replaces the index with `rows` (every live post it should hold). Anything not
+    in them was archived or fell out of the seed, and is dropped with its hot score.
+    Buffered views can put a post ahead of the database, so generations never go down.
+    """
+    global _items, _top, _window
+    with _lock:
+        items = {}
+        for row in rows:
+            post_id = row['id']
+            if _removed.get(post_id):
+                continue
+            previous = _items.get(post_id)
+            generations = row.get('generations') or 0
+            if previous is not None:
+                generations = max(generations, previous.generations)
+            items[post_id] = _make_item(post_id, row.get('username'), generations, row.get('current_quality', 100.0))
+        _items = items
+        _window = {post_id: gained for post_id, gained in _window.items() if post_id in items}
+        for _, gains in _buckets:
+            for post_id in [post_id for post_id in gains if post_id not in items]:
+                del gains[post_id]
+        _top = heapq.nlargest(TOP_K, items.values(), key=lambda item: item.generations)
+
+
+async def refresh():
+    """
+    Rebuilds the index from the SEED_SIZE posts with the most generations (one
+    indexed query), plus whichever hot posts are still live (one lookup by id).
+    """
+    if not adb.supabase: return
+    try:
+        response = await adb.execute(
+            adb.supabase.table("images").select(TRENDING_COLUMNS)
+            .eq("is_archived", False).order("generations", desc=True).limit(SEED_SIZE)
+        )
+        rows = response.data or []
+        seeded = {row['id'] for row in rows}
+        with _lock:
+            hot_ids = [post_id for post_id in _window if post_id not in seeded]
+        if hot_ids:
+            response = await adb.execute(
+                adb.supabase.table("images").select(TRENDING_COLUMNS)
+                .in_("id", hot_ids).eq("is_archived", False)
+            )
+            rows.extend(response.data or [])
+        _rebuild(rows)
+    except Exception as e:
+        print(f"TRENDING: refresh failed: {e}")
+
+
+async def run_refresher():
+    """Seeds the index on startup, then refreshes it every REFRESH_SECONDS (started from lifespan)."""
+    while True:
+        await refresh()
+        await asyncio.sleep(REFRESH_SECONDS)
@@ -1,4 +1,7 @@
 import hashlib
+import threading
+import time
+from collections import OrderedDict
 
 # --- CONFIGURATION ---
 SALT = "bitloss_secure_salt_v1_change_me_if_deployed"
@@ -19,4 +22,97 @@ def decay_text(text: str, health: float) -> str:
     Text decay is DISABLED. 
     Returns the original text regardless of health.
     """
-    return text
\ No newline at end of file
+    return text
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a time-to-live.
+    Bounded by entry count; the least recently used entry goes first.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {key: (expires_at, value)}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RenderCache:
+    """
+    Thread-safe LRU bounded by bytes: evictions go oldest-first once the budget
+    is exceeded. `size` measures an entry (len by default, for encoded frames).
+    """
+    def __init__(self, max_bytes, size=len):
+        self.max_bytes = max_bytes
+        self.size_of = size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def take(self, key):
+        """Removes and returns an entry, so only one caller mutates it at a time."""
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is None:
+                self.misses += 1
+                return None
+            self.size -= self.size_of(data)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self.size_of(self._entries.pop(key))
+            self._entries[key] = data
+            self.size += self.size_of(data)
+            while self.size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= self.size_of(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
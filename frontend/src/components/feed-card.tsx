@@ -26,7 +26,8 @@ interface FeedCardProps {
   generations: number 
   witnesses: number
   caption?: string
-  comments?: Comment[]
+  comments?: Comment[] // The latest few; the full thread loads when opened
+  comment_count?: number
   has_secret?: boolean
   userCredits?: number 
 }
@@ -40,6 +41,7 @@ export default function FeedCard({
   witnesses,
   caption,
   comments = [], 
+  comment_count = 0,
   has_secret = false,
   userCredits = 0 
 }: FeedCardProps) {
@@ -54,6 +56,10 @@ export default function FeedCard({
   // State
   const [localComments, setLocalComments] = useState<Comment[]>(comments)
   const [showComments, setShowComments] = useState(false)
+  const threadLoaded = useRef(false)
+  const [threadComments, setThreadComments] = useState<Comment[]>([])  // Pages loaded so far, oldest first
+  const [threadCursor, setThreadCursor] = useState<string | null>(null)
+  const [isLoadingThread, setIsLoadingThread] = useState(false)
   const [isHovered, setIsHovered] = useState(false)
   const [isHealing, setIsHealing] = useState(false)
   const [isCorrupting, setIsCorrupting] = useState(false)
@@ -71,7 +77,7 @@ export default function FeedCard({
   const tapCount = useRef<number>(0)
   
   const isDead = localIntegrity <= 0
-  const isSecretActive = has_secret && localIntegrity >= 80
+  const isSecretActive = has_secret && localIntegrity >= 80  // backend/stego.py MIN_READABLE_INTEGRITY
   
   // --- 1. SECRET GATE LOGIC (DESKTOP) ---
   const { isUnlocked } = useSecretGate(id, isSecretActive, isHovered)
@@ -107,6 +113,49 @@ export default function FeedCard({
   // --- STYLING ---
   const integrityBg = isDead ? "bg-red-500" : "bg-white"
   const latestComments = localComments.filter(c => !c.parent_id).slice(-2);
+  const totalComments = Math.max(comment_count, localComments.length)
+
+  // --- LOAD THE THREAD (first page when the comments open, the rest on demand) ---
+  const loadThreadPage = async (cursor: string | null) => {
+    const flatten = (nodes: any[], out: Comment[] = []) => {
+      for (const { replies, ...comment } of nodes) {
+        out.push(comment)
+        flatten(replies || [], out)
+      }
+      return out
+    }
+
+    setIsLoadingThread(true)
+    try {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""
+      const res = await fetch(`${API_URL}/posts/${id}/comments${query}`)
+      if (!res.ok) throw new Error(`Comments request failed: ${res.status}`)
+      const page = await res.json()
+      const loaded = flatten(page.comments)
+      setThreadComments(prev => [...prev, ...loaded])
+      setThreadCursor(page.next_cursor ?? null)
+    } finally {
+      setIsLoadingThread(false)
+    }
+  }
+
+  useEffect(() => {
+    if (!showComments || threadLoaded.current || comment_count <= comments.length) return
+    threadLoaded.current = true
+    loadThreadPage(null).catch(error => {
+      console.error("Thread Error:", error)
+      threadLoaded.current = false
+    })
+  }, [showComments, comment_count, comments.length, id, API_URL])
+
+  // Loaded pages first, then the latest-comment previews and anything posted since
+  const threadIds = new Set(threadComments.map(c => c.id))
+  const shownComments = [...threadComments, ...localComments.filter(c => !threadIds.has(c.id))]
+
+  const loadMoreComments = () => {
+    if (!threadCursor || isLoadingThread) return
+    loadThreadPage(threadCursor).catch(error => console.error("Thread Error:", error))
+  }
 
   // --- SYNC CREDITS ---
   useEffect(() => {
@@ -376,9 +425,9 @@ export default function FeedCard({
            </div>
          )}
 
-         {localComments.length > 0 && (
+         {totalComments > 0 && (
             <button onClick={() => setShowComments(!showComments)} className="text-white/40 text-sm mb-2 hover:text-white/70 transition-colors">
-               View all {localComments.length} comments
+               View all {totalComments} comments
             </button>
          )}
 
@@ -424,9 +473,14 @@ export default function FeedCard({
              <div className="p-5">
                <CommentSection 
                  postId={id} 
-                 comments={localComments} 
+                 comments={shownComments} 
                  onPostComment={handlePostComment}
                />
+               {threadCursor && (
+                 <button onClick={loadMoreComments} disabled={isLoadingThread} className="mt-4 text-white/40 text-sm hover:text-white/70 transition-colors disabled:opacity-50">
+                   {isLoadingThread ? "Loading..." : "Load more comments"}
+                 </button>
+               )}
              </div>
           </motion.div>
         )}
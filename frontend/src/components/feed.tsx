@@ -1,15 +1,21 @@
 "use client"
 
-import { useEffect, useState } from "react"
+import { useEffect, useRef, useState } from "react"
 import { motion } from "framer-motion"
 import FeedCard from "./feed-card"
 import { createClient } from "@/utils/supabase/client"
 import EmptyFeedState from "@/components/empty-feed-state"
 
+const RESYNC_INTERVAL_MS = 60000 // Everything else arrives over /stream
+
 const scrollbarHiddenClass = "[&::-webkit-scrollbar]:hidden [-ms-overflow-style:'none'] [scrollbar-width:'none']"
 
 export default function Feed() {
   const [posts, setPosts] = useState<any[]>([])
+  const [olderPosts, setOlderPosts] = useState<any[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
+  const hasOlderPages = useRef(false) // Resyncs must not reset the cursor once older pages are loaded
   const [userCredits, setUserCredits] = useState(0)
   const [isInitialLoad, setIsInitialLoad] = useState(true)
   const supabase = createClient()
@@ -17,70 +23,94 @@ export default function Feed() {
   // --- DYNAMIC API URL ---
   const API_URL = process.env.NEXT_PUBLIC_API_URL || "https://bitrot.onrender.com"
 
-  const fetchFeed = async () => {
-    try {
-      // 1. Get Session & Token
-      const { data: { session } } = await supabase.auth.getSession()
-      const token = session?.access_token
-      
-      // 2. Fetch User Credits (if logged in)
-      if (session?.user) {
-         const { data: userData } = await supabase
-            .from('users')
-            .select('credits')
-            .eq('id', session.user.id)
-            .single()
-         
-         if (userData) {
-             setUserCredits(userData.credits || 0)
-         }
-      }
+  const supabaseUrl = process.env.NEXT_PUBLIC_SUPABASE_URL || "https://iqtidkshavbicaecmxtd.supabase.co" 
+  const renderBackendUrl = "https://bitrot.onrender.com"
 
-      // 3. Fetch Feed from Backend (With Auth Header)
-      const res = await fetch(`${API_URL}/feed`, { 
-        cache: 'no-store',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': token ? `Bearer ${token}` : '' // <--- CRITICAL FIX
-        }
-      })
-      
-      if (!res.ok) throw new Error(`Feed fetch failed: ${res.status}`)
+  // Robust URL Construction
+  const formatPost = (row: any) => {
+    let imageUrl = ""
 
-      const rawData = await res.json()
-      
-      const supabaseUrl = process.env.NEXT_PUBLIC_SUPABASE_URL || "https://iqtidkshavbicaecmxtd.supabase.co" 
-      const renderBackendUrl = "https://bitrot.onrender.com"
-
-      // 4. Robust URL Construction
-      const formattedData = rawData.map((row: any) => {
-        let imageUrl = ""
-
-        if (row.storage_path) {
-            imageUrl = `${supabaseUrl}/storage/v1/object/public/bitloss-images/${row.storage_path}`
-        } else if (row.image) {
-            if (row.image.startsWith("http")) {
-                imageUrl = row.image
-            } else {
-                const cleanPath = row.image.startsWith("/") ? row.image.substring(1) : row.image
-                imageUrl = `${renderBackendUrl}/${cleanPath}`
-            }
+    if (row.storage_path) {
+        imageUrl = `${supabaseUrl}/storage/v1/object/public/bitloss-images/${row.storage_path}`
+    } else if (row.image) {
+        if (row.image.startsWith("http")) {
+            imageUrl = row.image
+        } else {
+            const cleanPath = row.image.startsWith("/") ? row.image.substring(1) : row.image
+            imageUrl = `${renderBackendUrl}/${cleanPath}`
         }
+    }
 
-        return {
-          id: row.id,
-          username: row.username,
-          image: `${imageUrl}?t=${row.generations}`, // Cache busting
-          bitIntegrity: row.bitIntegrity, 
-          generations: row.generations,
-          witnesses: row.witnesses,
-          caption: row.caption,
-          comments: row.comments || [], 
-          has_secret: row.has_secret 
-        }
-      })
-      
-      setPosts(formattedData)
+    return {
+      id: row.id,
+      username: row.username,
+      image: `${imageUrl}?t=${row.generations}`, // Cache busting
+      bitIntegrity: row.bitIntegrity, 
+      generations: row.generations,
+      witnesses: row.witnesses,
+      caption: row.caption,
+      comments: row.comments || [], 
+      comment_count: row.comment_count ?? (row.comments || []).length,
+      has_secret: row.has_secret 
+    }
+  }
+
+  const fetchPage = async (cursor: string | null) => {
+    const { data: { session } } = await supabase.auth.getSession()
+    const token = session?.access_token
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""
+
+    const res = await fetch(`${API_URL}/feed${query}`, { 
+      cache: 'no-store',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': token ? `Bearer ${token}` : '' // <--- CRITICAL FIX
+      }
+    })
+    
+    if (!res.ok) throw new Error(`Feed fetch failed: ${res.status}`)
+
+    const page = await res.json()
+    return { posts: (page.posts || []).map(formatPost), nextCursor: page.next_cursor ?? null }
+  }
+
+  const loadOlder = async () => {
+    if (!nextCursor || isLoadingMore) return
+    setIsLoadingMore(true)
+    try {
+      const page = await fetchPage(nextCursor)
+      hasOlderPages.current = true
+      setOlderPosts(prev => [...prev, ...page.posts])
+      setNextCursor(page.nextCursor)
+    } catch (err) {
+      console.error("Backend offline or blocked:", err)
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
+  const fetchCredits = async () => {
+    const { data: { session } } = await supabase.auth.getSession()
+    if (!session?.user) return
+
+    const { data: userData } = await supabase
+      .from('users')
+      .select('credits')
+      .eq('id', session.user.id)
+      .single()
+
+    if (userData) {
+      setUserCredits(userData.credits || 0)
+    }
+  }
+
+  // Full resync: witness rewards need an authenticated read, and it repairs anything a dropped event missed
+  const fetchFeed = async () => {
+    try {
+      await fetchCredits()
+      const page = await fetchPage(null)
+      setPosts(page.posts)
+      if (!hasOlderPages.current) setNextCursor(page.nextCursor)
     } catch (err) {
       console.error("Backend offline or blocked:", err)
     } finally {
@@ -88,12 +118,64 @@ export default function Feed() {
     }
   }
 
+  // Applies a live delta to whichever list holds the post
+  const patchPosts = (update: (post: any) => any) => {
+    setPosts(prev => prev.map(update))
+    setOlderPosts(prev => prev.map(update))
+  }
+
   useEffect(() => {
     fetchFeed()
-    const interval = setInterval(fetchFeed, 4000)
-    return () => clearInterval(interval)
+    const resync = setInterval(fetchFeed, RESYNC_INTERVAL_MS)
+
+    // Live updates: one snapshot on connect, then only what changed
+    const events = new EventSource(`${API_URL}/stream`)
+
+    events.addEventListener("snapshot", (e: MessageEvent) => {
+      const page = JSON.parse(e.data)
+      setPosts((page.posts || []).map(formatPost))
+      if (!hasOlderPages.current) setNextCursor(page.next_cursor ?? null)
+      setIsInitialLoad(false)
+    })
+
+    events.addEventListener("integrity", (e: MessageEvent) => {
+      const changes = new Map<any, any>(JSON.parse(e.data).map((c: any) => [c.id, c]))
+      patchPosts(post => {
+        const change = changes.get(post.id)
+        if (!change) return post
+        return { ...post, bitIntegrity: change.bitIntegrity, image: change.image || post.image }
+      })
+    })
+
+    events.addEventListener("post", (e: MessageEvent) => {
+      const post = formatPost(JSON.parse(e.data))
+      setPosts(prev => prev.some(p => p.id === post.id) ? prev : [post, ...prev])
+    })
+
+    events.addEventListener("comment", (e: MessageEvent) => {
+      const { post_id, comment } = JSON.parse(e.data)
+      patchPosts(post => {
+        if (post.id !== post_id || post.comments.some((c: any) => c.id === comment.id)) return post
+        return { ...post, comments: [...post.comments, comment], comment_count: post.comment_count + 1 }
+      })
+    })
+
+    events.addEventListener("archive", (e: MessageEvent) => {
+      const { id } = JSON.parse(e.data)
+      setPosts(prev => prev.filter(post => post.id !== id))
+      setOlderPosts(prev => prev.filter(post => post.id !== id))
+      window.dispatchEvent(new CustomEvent("bitrot:archive", { detail: { id } })) // Sidebar refreshes the graveyard
+    })
+
+    return () => {
+      clearInterval(resync)
+      events.close()
+    }
   }, [])
 
+  const headIds = new Set(posts.map(post => post.id))
+  const visiblePosts = [...posts, ...olderPosts.filter(post => !headIds.has(post.id))]
+
   const containerClass = posts.length === 0 ? "w-full" : "w-full max-w-2xl mx-auto"
 
   return (
@@ -133,7 +215,7 @@ export default function Feed() {
            </motion.div>
       ) : (
            <div className="px-0 md:px-6 pb-6 space-y-8 w-full relative z-10">
-             {posts.map((post, index) => (
+             {visiblePosts.map((post, index) => (
                <motion.div
                  key={post.id}
                  initial={{ opacity: 0, y: 20 }}
@@ -146,6 +228,16 @@ export default function Feed() {
                  />
                </motion.div>
              ))}
+
+             {nextCursor && (
+               <button
+                 onClick={loadOlder}
+                 disabled={isLoadingMore}
+                 className="w-full py-3 border border-white/10 text-[10px] text-white/50 tracking-[0.2em] uppercase font-bold hover:text-[#0066FF] hover:border-[#0066FF]/40 transition-colors disabled:opacity-40"
+               >
+                 {isLoadingMore ? "/// RETRIEVING..." : "/// LOAD_OLDER_ARTIFACTS"}
+               </button>
+             )}
            </div>
       )}
 
@@ -9,6 +9,7 @@ import { Trash2, Activity, AlertTriangle, Hash, Zap, ChevronRight } from "lucide
 // --- CONSTANTS (Defined outside to be stable) ---
 const RAW_API_URL = process.env.NEXT_PUBLIC_API_URL || "https://bitrot.onrender.com"
 const API_URL = RAW_API_URL.replace(/\/$/, "")
+const REFRESH_INTERVAL_MS = 30000
 
 const scrollbarHiddenClass = "[&::-webkit-scrollbar]:hidden [-ms-overflow-style:'none'] [scrollbar-width:'none']"
 
@@ -42,8 +43,13 @@ export default function Sidebar() {
     }
 
     fetchData()
-    const interval = setInterval(fetchData, 5000)
-    return () => clearInterval(interval)
+    // The feed's live stream announces archivals; the slow interval only keeps trending fresh
+    window.addEventListener("bitrot:archive", fetchData)
+    const interval = setInterval(fetchData, REFRESH_INTERVAL_MS)
+    return () => {
+      window.removeEventListener("bitrot:archive", fetchData)
+      clearInterval(interval)
+    }
   }, []) // <--- Empty dependency array is now safe because API_URL is a global constant
 
   const formatIntegrity = (value: any) => {